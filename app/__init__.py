@@ -16,12 +16,38 @@ def create_app():
     flask_app = Flask(__name__)
     flask_app.config.from_object(Config)
 
+    # orjson-backed jsonify when orjson is installed (see app/serialization.py)
+    from app.serialization import FastJSONProvider
+    flask_app.json = FastJSONProvider(flask_app)
+
     # Initialize plugins
     db.init_app(flask_app)
     migrate.init_app(flask_app, db)
     jwt.init_app(flask_app)
     CORS(flask_app) # Allow frontend to talk to this backend
-    socketio.init_app(flask_app)
+    # Rooms span workers when SOCKETIO_MESSAGE_QUEUE is set (see app/socket_queue.py)
+    from app.socket_queue import create_client_manager
+    socketio.init_app(flask_app, client_manager=create_client_manager(flask_app))
+
+    # Cooperative DB access under gevent and a per-worker bound on checkouts (see app/db_concurrency.py)
+    from app.db_concurrency import init_green_driver, db_gate
+    init_green_driver(flask_app)
+    db_gate.init_app(flask_app)
+
+    from app.location_hub import location_hub
+    location_hub.init_app(flask_app)
+
+    from app.chat_pipeline import chat_pipeline
+    chat_pipeline.init_app(flask_app)
+
+    from app.stats import stats_cache
+    stats_cache.init_app(flask_app)
+
+    from app.user_cache import user_cache
+    user_cache.init_app(flask_app)
+
+    from app.perf import request_monitor
+    request_monitor.init_app(flask_app)
 
     # Import and register Blueprints
 
@@ -49,6 +75,18 @@ def create_app():
     from app.tracking import tracking_bp
     flask_app.register_blueprint(tracking_bp, url_prefix='/api/tracking')
 
-    from app import socket_tracking, socket_chat
+    from app import socket_auth, socket_tracking, socket_chat
+    socket_tracking.coalescer.init_app(flask_app)
+
+    # Prometheus exposition at /metrics; wraps the Socket.IO handlers imported above
+    from app import metrics
+    metrics.init_app(flask_app)
+
+    # CLI maintenance commands (flask places reindex, flask ratings backfill, ...)
+    from app.commands import places_cli, routes_cli, ratings_cli, stats_cli
+    flask_app.cli.add_command(places_cli)
+    flask_app.cli.add_command(routes_cli)
+    flask_app.cli.add_command(ratings_cli)
+    flask_app.cli.add_command(stats_cli)
 
     return flask_app
\ No newline at end of file
@@ -1,24 +1,29 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import User, Ride, Vehicle
+from app.models import User, Vehicle
 from app.decorators import admin_required
+from app.tokens import revoke_tokens
+from app.stats import stats_cache
+from app.location_hub import location_hub
+from app.chat_pipeline import chat_pipeline
+from app.socket_tracking import coalescer
+from app.user_cache import user_cache
+from app.perf import request_monitor
+from app.db_concurrency import db_gate
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 admin_bp = Blueprint('admin', __name__)
 
+USER_ROLES = ('passenger', 'driver', 'both', 'admin')
+
 # --- ADMIN ENDPOINTS ---
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required()
 @jwt_required()
 def get_stats():
-    # In a real app, you would add a check here to ensure get_jwt_identity() is an admin
-    stats = {
-        "total_users": User.query.count(),
-        "total_rides": Ride.query.count(),
-        "pending_vehicles": Vehicle.query.filter_by(is_verified=False).count()
-    }
-    return jsonify(stats), 200
+    # Served from incrementally maintained counters; see app/stats.py
+    return jsonify(stats_cache.snapshot()), 200
 
 @admin_bp.route('/verify-vehicle/<int:vid>', methods=['POST'])
 @admin_required()
@@ -31,4 +36,43 @@ def verify_vehicle(vid):
         
     v.is_verified = True
     db.session.commit()
-    return jsonify({"msg": f"Vehicle {v.license_plate} verified successfully"}), 200
\ No newline at end of file
+    return jsonify({"msg": f"Vehicle {v.license_plate} verified successfully"}), 200
+
+@admin_bp.route('/users/<int:uid>/role', methods=['PUT'])
+@admin_required()
+@jwt_required()
+def change_user_role(uid):
+    role = (request.get_json() or {}).get('role')
+    if role not in USER_ROLES:
+        return jsonify({"msg": f"Role must be one of: {', '.join(USER_ROLES)}"}), 400
+
+    user = User.query.get(uid)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+
+    if user.role != role:
+        user.role = role
+        # Tokens carry the role as a claim; make the user log in again to get the new one
+        revoke_tokens(user)
+        db.session.commit()
+    return jsonify({"msg": f"User {user.id} is now '{role}'", "role": role}), 200
+
+@admin_bp.route('/runtime', methods=['GET'])
+@admin_required()
+@jwt_required()
+def get_runtime_stats():
+    # In-process buffers and caches of the worker that served this request
+    return jsonify({
+        "location_hub": location_hub.stats(),
+        "location_coalescer": coalescer.stats(),
+        "chat_pipeline": chat_pipeline.stats(),
+        "user_cache": user_cache.stats(),
+        "db_gate": db_gate.stats()
+    }), 200
+
+@admin_bp.route('/perf', methods=['GET'])
+@admin_required()
+@jwt_required()
+def get_perf_summary():
+    # Rolling per-route latency and SQL figures of the worker that served this request
+    return jsonify(request_monitor.summary()), 200
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import User
+from app.user_cache import user_cache
+from app.tokens import access_claims
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
 
 auth_bp = Blueprint('auth', __name__)
@@ -68,7 +70,7 @@ def login():
     user = User.query.filter_by(email=email).first()
 
     if user and user.check_password(password):
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims=access_claims(user))
         
         return jsonify({
             "msg": "Login successful",
@@ -90,7 +92,7 @@ def login():
 def get_current_user():
     current_user_id = get_jwt_identity()
     
-    user = User.query.get(current_user_id)
+    user = user_cache.get(current_user_id)
     
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -104,6 +106,8 @@ def get_current_user():
         "bio": user.bio,
         "created_at": user.created_at,
         "average_rating": user.average_rating,
+        "rating_count": user.rating_count,
+        "rating_histogram": user.rating_histogram,
         "total_ride_count": user.total_ride_count,
         "is_identity_verified": user.is_identity_verified,
         "driver_license_id": user.driver_license_id,
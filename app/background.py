@@ -0,0 +1,65 @@
+import atexit
+import logging
+import os
+from app import socketio
+
+logger = logging.getLogger(__name__)
+
+_flushers = []
+
+
+def flush_all():
+    """Runs every exit-time flush once, e.g. from a server's worker-exit hook."""
+    for flusher in _flushers:
+        if flusher.flush_at_exit:
+            flusher.flush_now()
+
+
+class PeriodicFlusher:
+    """
+    Calls `flush` every `interval` seconds inside an app context, using a
+    Socket.IO background task (a greenlet under gevent, a thread otherwise).
+
+    The task is started lazily on first use so that nothing runs in a
+    pre-fork master process, and (unless flush_at_exit is False) `flush` is
+    called once more at interpreter exit so buffered writes are not lost on a
+    clean shutdown. Servers that don't run atexit hooks on worker shutdown
+    should call flush_all() (see gunicorn.conf.py).
+    """
+
+    def __init__(self, name, flush, interval=5.0, flush_at_exit=True):
+        self.name = name
+        self.flush = flush
+        self.interval = interval
+        self.flush_at_exit = flush_at_exit
+        self.app = None
+        self._pid = None
+        _flushers.append(self)
+
+    def init_app(self, app, interval=None):
+        self.app = app
+        if interval is not None:
+            self.interval = interval
+
+    def start(self):
+        # Restart after a fork: background tasks don't survive into the child
+        if self._pid == os.getpid() or self.app is None:
+            return
+        if self._pid is None and self.flush_at_exit:
+            atexit.register(self.flush_now)
+        self._pid = os.getpid()
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            self.flush_now()
+
+    def flush_now(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("%s flush failed", self.name)
@@ -1,27 +1,84 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from app import db
 from app.models import ChatMessage, User
+from app.pagination import get_page_size
+from app.serialization import chat_message_row
+from app.conditional import make_etag, not_modified, tag
 from flask_jwt_extended import jwt_required
+from sqlalchemy import func, select, and_, or_
 
 chat_bp = Blueprint('chat', __name__)
 
+CHAT_PAGE_SIZE = 50
+MAX_CHAT_PAGE_SIZE = 200
+
+message_with_sender_row = chat_message_row.extend(sender_name=User.full_name)
+
 @chat_bp.route('/history/<int:ride_id>', methods=['GET'])
 @jwt_required()
 def get_chat_history(ride_id):
     """
-    Fetches all previous messages for a specific ride.
-    Returns a list of messages including sender names for the UI to display.
+    Fetches one page of messages for a specific ride, oldest first, including
+    sender names for the UI to display.
+    With no cursor the latest page is returned; ?before=<message_id> pages back
+    in time and ?after=<message_id> fetches messages newer than the one given.
     """
-    # Query messages for this ride, ordered by time (oldest first)
-    messages = ChatMessage.query.filter_by(ride_id=ride_id).order_by(ChatMessage.timestamp.asc()).all()
-    
-    # We use a list comprehension to convert all messages to dictionaries.
-    # The to_dict() method in your models.py should include 'sender_name'.
-    history = []
-    for m in messages:
-        msg_data = m.to_dict()
-        # Ensure sender_name is present even if to_dict is minimal
-        if 'sender_name' not in msg_data:
-            msg_data['sender_name'] = m.sender.full_name
-        history.append(msg_data)
-
-    return jsonify(history), 200
\ No newline at end of file
+    before_id = request.args.get('before', type=int)
+    after_id = request.args.get('after', type=int)
+    if before_id and after_id:
+        return jsonify({"msg": "Use either 'before' or 'after', not both."}), 400
+
+    try:
+        limit = get_page_size(default=CHAT_PAGE_SIZE, maximum=MAX_CHAT_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # Versioned by the ride's highest message id and message count. Not by the newest
+    # message in (timestamp, id) order: the chat pipeline stamps messages when they are
+    # sent but inserts them later, per worker, so a late insert can carry an older
+    # timestamp than rows already there. Served from the (ride_id, timestamp, id) index.
+    latest_id, message_count = db.session.query(
+        func.max(ChatMessage.id), func.count(ChatMessage.id)
+    ).filter(ChatMessage.ride_id == ride_id).one()
+    etag = make_etag(latest_id, message_count)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    # Sender names come from the same query instead of one lazy load per message
+    query = message_with_sender_row.query().join(
+        User, ChatMessage.sender_id == User.id
+    ).filter(ChatMessage.ride_id == ride_id)
+
+    # Keyset on (timestamp, id); the anchor's timestamp is resolved inside the same statement
+    anchor_id = after_id or before_id
+    if anchor_id:
+        anchor_ts = select(ChatMessage.timestamp).where(ChatMessage.id == anchor_id).scalar_subquery()
+        if after_id:
+            query = query.filter(or_(ChatMessage.timestamp > anchor_ts,
+                                     and_(ChatMessage.timestamp == anchor_ts, ChatMessage.id > anchor_id)))
+        else:
+            query = query.filter(or_(ChatMessage.timestamp < anchor_ts,
+                                     and_(ChatMessage.timestamp == anchor_ts, ChatMessage.id < anchor_id)))
+
+    if after_id:
+        query = query.order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+    else:
+        # Walk backwards from the newest message, then flip to chronological order
+        query = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after_id:
+        rows.reverse()
+
+    history = message_with_sender_row.dump_all(rows)
+
+    return tag(jsonify({
+        "messages": history,
+        "has_more": has_more,
+        # Cursors for the next requests: older via ?before=, newer via ?after=
+        "before": history[0]['id'] if history else before_id,
+        "after": history[-1]['id'] if history else after_id
+    }), etag), 200
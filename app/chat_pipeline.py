@@ -0,0 +1,140 @@
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.background import PeriodicFlusher
+from app.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ChatUnavailable(Exception):
+    """The queue is full and could not be drained, so the message was not accepted."""
+
+
+class ChatPipeline:
+    """
+    Write-behind queue for Socket.IO chat messages.
+
+    submit() stamps a message with a server-side uid and timestamp and returns
+    it immediately so it can be emitted without waiting on the database. A
+    background flusher bulk-inserts queued messages every CHAT_FLUSH_INTERVAL
+    seconds in batches of CHAT_BATCH_SIZE. When CHAT_QUEUE_MAX messages are
+    already waiting, the submitting handler flushes inline before its message
+    is accepted, which slows producers down instead of dropping messages; if
+    that flush fails (e.g. the database is down) submit() raises
+    ChatUnavailable rather than queueing without bound. The queue is also
+    flushed at interpreter exit and, under gunicorn, by the worker_exit hook
+    in gunicorn.conf.py.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flusher = PeriodicFlusher('chat-pipeline', self.flush, interval=0.25)
+        self.max_queue = 10000
+        self.batch_size = 500
+
+        self.messages_submitted = 0
+        self.messages_persisted = 0
+        self.messages_rejected = 0
+        self.messages_refused = 0
+        self.batches_written = 0
+        self.flush_failures = 0
+        self.backpressure_flushes = 0
+
+    def init_app(self, app):
+        self._flusher.init_app(app, app.config.get('CHAT_FLUSH_INTERVAL', 0.25))
+        self.max_queue = app.config.get('CHAT_QUEUE_MAX', 10000)
+        self.batch_size = app.config.get('CHAT_BATCH_SIZE', 500)
+
+    def submit(self, ride_id, sender_id, content, receiver_id=None):
+        """Queues a message for persistence and returns its row values. Must run in an app context."""
+        row = {
+            'uid': uuid.uuid4().hex,
+            'ride_id': int(ride_id),
+            'sender_id': int(sender_id),
+            'receiver_id': int(receiver_id) if receiver_id else None,
+            'content': content,
+            'timestamp': datetime.now(timezone.utc)
+        }
+
+        while True:
+            with self._lock:
+                if len(self._queue) < self.max_queue:
+                    self._queue.append(row)
+                    self.messages_submitted += 1
+                    break
+                self.backpressure_flushes += 1
+            # Queue is full: this producer pays for a flush before being accepted
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Chat queue full and flush failed; refusing message")
+                with self._lock:
+                    self.messages_refused += 1
+                raise ChatUnavailable("Chat is temporarily unavailable") from None
+
+        self._flusher.start()
+        return row
+
+    def flush(self):
+        """Bulk-inserts everything queued, one batch per transaction."""
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return
+
+            try:
+                db.session.execute(ChatMessage.__table__.insert(), batch)
+                db.session.commit()
+            except IntegrityError:
+                # A bad row (e.g. unknown ride) must not block the rest of the batch
+                db.session.rollback()
+                self._insert_individually(batch)
+                continue
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                    self.flush_failures += 1
+                raise
+
+            with self._lock:
+                self.batches_written += 1
+                self.messages_persisted += len(batch)
+
+    def _insert_individually(self, batch):
+        for row in batch:
+            try:
+                db.session.execute(ChatMessage.__table__.insert(), [row])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                logger.warning("Dropping chat message %s: constraint violation", row['uid'])
+                with self._lock:
+                    self.messages_rejected += 1
+                continue
+            with self._lock:
+                self.messages_persisted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'max_queue': self.max_queue,
+                'messages_submitted': self.messages_submitted,
+                'messages_persisted': self.messages_persisted,
+                'messages_rejected': self.messages_rejected,
+                'messages_refused': self.messages_refused,
+                'batches_written': self.batches_written,
+                'flush_failures': self.flush_failures,
+                'backpressure_flushes': self.backpressure_flushes
+            }
+
+
+chat_pipeline = ChatPipeline()
@@ -0,0 +1,100 @@
+import click
+from collections import Counter, defaultdict
+from flask.cli import AppGroup
+from sqlalchemy import func
+from app import db
+from app.models import Ride, RideRouteCell, Review, User
+from app.places import get_or_create_place
+from app.geo import route_points, route_cells
+from app.stats import stats_cache
+from app.user_cache import user_cache
+
+places_cli = AppGroup('places', help='Maintain the origin/destination place index.')
+routes_cli = AppGroup('routes', help='Maintain the ride route cell index.')
+ratings_cli = AppGroup('ratings', help='Maintain per-user rating aggregates.')
+stats_cli = AppGroup('stats', help='Maintain the admin dashboard counters.')
+
+
+@places_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True)
+def reindex_places(batch_size):
+    """Links every ride to its normalized origin/destination places."""
+    cache = {}
+    last_id = 0
+    updated = 0
+    while True:
+        rides = Ride.query.filter(Ride.id > last_id).order_by(Ride.id).limit(batch_size).all()
+        if not rides:
+            break
+        for ride in rides:
+            origin = get_or_create_place(ride.origin, cache)
+            destination = get_or_create_place(ride.destination, cache)
+            ride.origin_place_id = origin.id if origin else None
+            ride.destination_place_id = destination.id if destination else None
+        db.session.commit()
+        updated += len(rides)
+        last_id = rides[-1].id
+
+    click.echo(f"Indexed {updated} rides across {len(cache)} places.")
+
+
+@routes_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True)
+def reindex_routes(batch_size):
+    """Rebuilds ride_route_cell from every ride's origin, waypoints and destination."""
+    db.session.query(RideRouteCell).delete()
+    columns = (Ride.id, Ride.departure_time, Ride.origin_lat, Ride.origin_lng, Ride.waypoints_polyline,
+               Ride.destination_lat, Ride.destination_lng)
+    last_id = 0
+    rides = cells = 0
+    while True:
+        rows = db.session.query(*columns).filter(Ride.id > last_id).order_by(Ride.id).limit(batch_size).all()
+        if not rows:
+            break
+        entries = [{'cell': cell, 'ride_id': row.id, 'seq': seq, 'departure_time': row.departure_time}
+                   for row in rows for cell, seq in route_cells(route_points(*row[2:]))]
+        if entries:
+            db.session.execute(RideRouteCell.__table__.insert(), entries)
+        rides += len(rows)
+        cells += len(entries)
+        last_id = rows[-1].id
+    db.session.commit()
+
+    click.echo(f"Indexed {cells} route cells for {rides} rides.")
+
+
+@ratings_cli.command('backfill')
+def backfill_ratings():
+    """Recomputes every user's rating_sum/rating_count/histogram from the review table."""
+    rows = db.session.query(
+        Review.reviewee_id, Review.rating, func.count(Review.id)
+    ).group_by(Review.reviewee_id, Review.rating).all()
+
+    per_user = defaultdict(Counter)
+    for reviewee_id, rating, count in rows:
+        per_user[reviewee_id][rating] += count
+
+    reset = {'rating_sum': 0, 'rating_count': 0}
+    reset.update({f'rating_{stars}_count': 0 for stars in range(1, 6)})
+    User.query.update(reset, synchronize_session=False)
+
+    for user_id, counts in per_user.items():
+        values = {
+            'rating_sum': sum(rating * count for rating, count in counts.items()),
+            'rating_count': sum(counts.values())
+        }
+        values.update({f'rating_{stars}_count': counts.get(stars, 0) for stars in range(1, 6)})
+        values['average_rating'] = values['rating_sum'] / values['rating_count']
+        User.query.filter_by(id=user_id).update(values, synchronize_session=False)
+
+    db.session.commit()
+    user_cache.clear()
+    click.echo(f"Backfilled rating aggregates for {len(per_user)} users.")
+
+
+@stats_cli.command('reconcile')
+def reconcile_stats():
+    """Recomputes the admin dashboard counters from the source tables."""
+    stats_cache.reconcile()
+    click.echo("Stats counters reconciled.")
+
@@ -0,0 +1,28 @@
+import hashlib
+from flask import request, current_app
+
+# Conditional GET support: ETags are computed from cheap version information
+# (the ids and updated_at of the rows a page covers, id high-water marks)
+# instead of hashing the body, so an unchanged poll is answered with a 304
+# before the real query runs.
+
+
+def make_etag(*parts):
+    """Short opaque tag for the given version parts (and the request's query string)."""
+    raw = repr((request.path, request.query_string, parts)).encode()
+    return hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+
+def not_modified(etag):
+    """A 304 response if the client already holds `etag`, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        return tag(response, etag)
+    return None
+
+
+def tag(response, etag):
+    """Attaches the ETag and asks clients to revalidate on every use."""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
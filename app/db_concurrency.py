@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import db, socketio
+from app.metrics import Gauge, Histogram, register
+
+logger = logging.getLogger(__name__)
+
+GREEN_ASYNC_MODES = ('gevent', 'gevent_uwsgi')
+
+
+def make_psycopg2_green():
+    """
+    Makes psycopg2 yield to the gevent hub while it waits on the server, the
+    way psycogreen does: a wait callback polls the connection and parks the
+    greenlet on its socket instead of blocking the process. Returns False if
+    psycopg2 or gevent is not installed.
+    """
+    try:
+        import psycopg2
+        from psycopg2 import extensions
+        from gevent.socket import wait_read, wait_write
+    except ImportError:
+        return False
+
+    def gevent_wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+    extensions.set_wait_callback(gevent_wait_callback)
+    return True
+
+
+def green_threads():
+    """True when gevent has patched threading, so every worker thread is a greenlet."""
+    try:
+        from gevent.monkey import is_module_patched
+    except ImportError:
+        return False
+    return is_module_patched('threading')
+
+
+def init_green_driver(app):
+    """
+    Applies DB_GREEN: 'auto' makes psycopg2 cooperative when Socket.IO runs on
+    gevent, 'true' always tries, 'false' never does. PyMySQL needs nothing here;
+    it is pure Python and cooperative once gevent has patched sockets.
+    """
+    mode = app.config.get('DB_GREEN', 'auto')
+    if mode == 'false' or (mode == 'auto' and socketio.async_mode not in GREEN_ASYNC_MODES):
+        return False
+    if not (app.config.get('SQLALCHEMY_DATABASE_URI') or '').startswith('postgresql'):
+        return False
+    if not make_psycopg2_green():
+        logger.warning("DB_GREEN is on but psycopg2 or gevent is missing; queries will block the worker")
+        return False
+    return True
+
+
+class DBGate:
+    """
+    Bounds how many pooled connections a worker has checked out at once.
+
+    Up to DB_CONCURRENCY checkouts proceed; the rest queue for up to
+    DB_QUEUE_TIMEOUT seconds and then fail with the pool's TimeoutError. Under
+    monkey-patched gevent the slots live on the async mode's own queue, so
+    greenlets park instead of blocking the hub; otherwise the waiters are OS
+    threads, which a gevent queue would never wake, so a BoundedSemaphore
+    holds them. The
+    queue is what makes DB saturation visible: waiting, in-use and wait-time
+    figures are exported at /metrics and /api/admin/runtime.
+
+    A slot is taken in the pool's connect() and given back by the pool's
+    checkin event, so it covers exactly the time a connection is held.
+    """
+
+    def __init__(self):
+        self.limit = 0
+        self.timeout = 10.0
+        self._slots = None
+        self._queue_empty = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+
+        self.wait_histogram = Histogram('db_queue_wait_seconds',
+                                        'Time checkouts spent queued for a DB_CONCURRENCY slot.')
+        self.gauges = Gauge('db_queue', 'Checkouts holding or waiting for a DB_CONCURRENCY slot.', ['state'],
+                            lambda: {('in_use',): self.in_use, ('waiting',): self.waiting,
+                                     ('limit',): self.limit})
+
+    def init_app(self, app):
+        self.limit = app.config.get('DB_CONCURRENCY', 0)
+        self.timeout = app.config.get('DB_QUEUE_TIMEOUT', 10.0)
+        if not self.limit:
+            return
+
+        if socketio.async_mode in GREEN_ASYNC_MODES and green_threads():
+            eio = socketio.server.eio
+            self._slots = eio.create_queue()
+            self._queue_empty = eio.get_queue_empty_exception()
+            for _ in range(self.limit):
+                self._slots.put(None)
+        else:
+            self._semaphore = threading.BoundedSemaphore(self.limit)
+
+        register(self.wait_histogram)
+        register(self.gauges)
+        with app.app_context():
+            engine = db.engine
+            self._wrap_pool(engine)
+            # dispose() swaps in a fresh pool; listeners carry over to it
+            event.listen(engine, 'engine_disposed', self._wrap_pool)
+            event.listen(engine, 'checkin', self._on_checkin)
+
+    def _wrap_pool(self, engine):
+        connect = engine.pool.connect
+
+        def gated_connect():
+            self.acquire()
+            try:
+                return connect()
+            except BaseException:
+                self.release()
+                raise
+        engine.pool.connect = gated_connect
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.release()
+
+    def _take(self, timeout=None):
+        """Takes a slot, waiting up to timeout seconds (None: don't wait). False if none was free."""
+        if self._semaphore is not None:
+            if timeout is None:
+                return self._semaphore.acquire(blocking=False)
+            return self._semaphore.acquire(timeout=timeout)
+        try:
+            if timeout is None:
+                self._slots.get_nowait()
+            else:
+                self._slots.get(timeout=timeout)
+        except self._queue_empty:
+            return False
+        return True
+
+    def _give(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+        else:
+            self._slots.put(None)
+
+    def acquire(self):
+        if self._take():
+            with self._lock:
+                self.in_use += 1
+                self.acquired += 1
+            return
+
+        with self._lock:
+            self.waiting += 1
+            self.queued += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.perf_counter()
+        if not self._take(self.timeout):
+            with self._lock:
+                self.waiting -= 1
+                self.timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.timeout}s waiting for one of {self.limit} database slots"
+            ) from None
+
+        waited = time.perf_counter() - started
+        self.wait_histogram.observe(waited)
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_time += waited
+
+    def release(self):
+        with self._lock:
+            # Connections checked out before the gate was installed return no slot
+            if self.in_use == 0:
+                return
+            self.in_use -= 1
+        self._give()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'slots': 'queue' if self._slots is not None else 'semaphore' if self._semaphore is not None else None,
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'acquired': self.acquired,
+                'queued': self.queued,
+                'timeouts': self.timeouts,
+                'total_wait_sec': round(self.wait_time, 3),
+                'timeout_sec': self.timeout
+            }
+
+
+db_gate = DBGate()
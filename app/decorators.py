@@ -1,19 +1,38 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from app.models import User
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from app.user_cache import user_cache
 
-def admin_required():
+def current_role():
+    """
+    The caller's role, read from the token's claims. Tokens issued before roles
+    were embedded fall back to the user cache.
+    """
+    role = get_jwt().get('role')
+    if role is None:
+        user = user_cache.get(get_jwt_identity())
+        role = user.role if user else None
+    return role
+
+def role_required(*roles, msg="Insufficient permissions"):
+    """
+    Allows the request only if the caller's role is one of `roles`. Checks the
+    token's claims, so no database query is needed; role changes revoke older
+    tokens (see app/tokens.py).
+    """
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            
+            # Verify here as well: routes may list this decorator above @jwt_required()
+            verify_jwt_in_request()
+
             # THE SECURITY CHECK
-            if not user or user.role != 'admin':
-                return jsonify({"msg": "Admins only!"}), 403
-            
+            if current_role() not in roles:
+                return jsonify({"msg": msg}), 403
+
             return fn(*args, **kwargs)
         return decorator
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def admin_required():
+    return role_required('admin', msg="Admins only!")
@@ -0,0 +1,296 @@
+import math
+from sqlalchemy import and_, or_
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# Precision 7 cells are ~150m x 150m, fine enough for pickup points
+GEOHASH_PRECISION = 7
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Route cells are precision 6 (~1.2km x 0.6km), so a city route is a few dozen
+# index rows; segments are sampled every ROUTE_SAMPLE_KM when indexing them
+ROUTE_CELL_PRECISION = 6
+ROUTE_SAMPLE_KM = 0.1
+MAX_WAYPOINTS = 25
+# Google encoded polyline format: 5 decimal places, about a metre
+POLYLINE_PRECISION = 5
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    use_lng = True
+
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if use_lng else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits = bits * 2
+            bounds[1] = mid
+
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def _cell_size_degrees(precision):
+    """(height, width) in degrees of a geohash cell at the given precision."""
+    total_bits = 5 * precision
+    lat_bits = total_bits // 2
+    lng_bits = total_bits - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_geohashes(lat, lng, radius_km, max_precision=GEOHASH_PRECISION):
+    """
+    Returns geohash prefixes whose cells together cover a circle of radius_km.
+    Uses the finest precision whose cells are at least radius_km on each side,
+    so the centre cell plus its 8 neighbours always contain the whole circle.
+    """
+    km_per_degree_lng = KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01)
+
+    precision = 1
+    for candidate in range(max_precision, 0, -1):
+        height, width = _cell_size_degrees(candidate)
+        if height * KM_PER_DEGREE_LAT >= radius_km and width * km_per_degree_lng >= radius_km:
+            precision = candidate
+            break
+
+    height, width = _cell_size_degrees(precision)
+    prefixes = set()
+    for d_lat in (-1, 0, 1):
+        for d_lng in (-1, 0, 1):
+            cell_lat = min(max(lat + d_lat * height, -90.0), 89.999999)
+            cell_lng = (lng + d_lng * width + 180.0) % 360.0 - 180.0
+            prefixes.add(encode_geohash(cell_lat, cell_lng, precision))
+    return sorted(prefixes)
+
+
+def cells_within(lat, lng, radius_km, precision):
+    """
+    Every geohash cell of exactly the given precision overlapping the bounding
+    box of a circle of radius_km. Unlike covering_geohashes the cells never get
+    coarser as the radius grows, so they can be looked up by equality.
+    """
+    height, width = _cell_size_degrees(precision)
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    # Widest at the box edge nearest a pole
+    d_lng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(min(abs(lat) + d_lat, 90.0))), 0.01))
+
+    rows = range(math.floor((max(lat - d_lat, -90.0) + 90.0) / height),
+                 math.floor((min(lat + d_lat, 89.999999) + 90.0) / height) + 1)
+    cols = range(math.floor((lng - d_lng + 180.0) / width), math.floor((lng + d_lng + 180.0) / width) + 1)
+    cells = set()
+    for row in rows:
+        for col in cols:
+            cell_lng = (-180.0 + (col + 0.5) * width + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(-90.0 + (row + 0.5) * height, cell_lng, precision))
+    return sorted(cells)
+
+
+def _next_prefix(prefix):
+    """
+    The smallest geohash prefix sorting after every geohash starting with
+    prefix, or None if there is none (prefix is all 'z').
+    """
+    while prefix and prefix[-1] == _BASE32[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + _BASE32[_BASE32.index(prefix[-1]) + 1]
+
+
+def geohash_prefix_filter(column, prefixes):
+    """
+    SQL predicate matching any of the prefixes. Written as index-friendly
+    range comparisons rather than LIKE so every backend can use a B-tree.
+    Each range ends at the next prefix in the geohash alphabet, which sorts
+    the same under byte order and locale collations alike.
+    """
+    ranges = []
+    for prefix in prefixes:
+        upper = _next_prefix(prefix)
+        ranges.append(column >= prefix if upper is None else and_(column >= prefix, column < upper))
+    return or_(*ranges)
+
+
+def parse_point(data, lat_key, lng_key):
+    """
+    Reads an optional (lat, lng) pair from a request dict. Returns None if
+    neither key is present and raises ValueError if the pair is incomplete
+    or out of range.
+    """
+    lat = data.get(lat_key)
+    lng = data.get(lng_key)
+    if lat is None and lng is None:
+        return None
+    if lat is None or lng is None:
+        raise ValueError(f"Both {lat_key} and {lng_key} are required.")
+
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"Coordinates out of range: {lat_key}={lat}, {lng_key}={lng}.")
+    return lat, lng
+
+
+def parse_waypoints(value):
+    """
+    Reads an ordered list of waypoints from a request, each either [lat, lng]
+    or {"lat": ..., "lng": ...}. Returns [] for None and raises ValueError on
+    anything malformed, out of range or longer than MAX_WAYPOINTS.
+    """
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError("waypoints must be a list of [lat, lng] pairs.")
+    if len(value) > MAX_WAYPOINTS:
+        raise ValueError(f"At most {MAX_WAYPOINTS} waypoints are allowed.")
+
+    points = []
+    for item in value:
+        if isinstance(item, dict):
+            point = parse_point(item, 'lat', 'lng')
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            point = parse_point({'lat': item[0], 'lng': item[1]}, 'lat', 'lng')
+        else:
+            point = None
+        if point is None:
+            raise ValueError("Each waypoint must be [lat, lng] or {\"lat\": ..., \"lng\": ...}.")
+        points.append(point)
+    return points
+
+
+def encode_polyline(points):
+    """Encodes [(lat, lng), ...] in Google's encoded polyline format."""
+    factor = 10 ** POLYLINE_PRECISION
+    chars = []
+    previous = (0, 0)
+    for lat, lng in points:
+        current = (round(lat * factor), round(lng * factor))
+        for delta in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        previous = current
+    return ''.join(chars)
+
+
+def decode_polyline(encoded):
+    """Inverse of encode_polyline. Returns a list of (lat, lng) tuples."""
+    factor = 10 ** POLYLINE_PRECISION
+    points = []
+    coords = [0, 0]
+    index = 0
+    while index < len(encoded):
+        for axis in (0, 1):
+            result = shift = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            coords[axis] += ~(result >> 1) if result & 1 else result >> 1
+        points.append((coords[0] / factor, coords[1] / factor))
+    return points
+
+
+def route_points(origin_lat, origin_lng, waypoints_polyline, destination_lat, destination_lng):
+    """A ride's route in order: origin, waypoints, destination, skipping unknown ends."""
+    points = []
+    if origin_lat is not None:
+        points.append((origin_lat, origin_lng))
+    if waypoints_polyline:
+        points.extend(decode_polyline(waypoints_polyline))
+    if destination_lat is not None:
+        points.append((destination_lat, destination_lng))
+    return points
+
+
+def route_cells(points, precision=ROUTE_CELL_PRECISION):
+    """
+    Returns the sorted (cell, seq) pairs for a route: the geohash cells that
+    segment seq (points[seq] -> points[seq + 1]) passes through. Segments are
+    sampled every ROUTE_SAMPLE_KM, so a search must pad its radius by half of
+    that to be sure of finding every segment within range.
+    """
+    cells = set()
+    for seq, (a, b) in enumerate(zip(points, points[1:])):
+        steps = max(1, math.ceil(haversine_km(*a, *b) / ROUTE_SAMPLE_KM))
+        for step in range(steps + 1):
+            f = step / steps
+            cells.add((encode_geohash(a[0] + (b[0] - a[0]) * f, a[1] + (b[1] - a[1]) * f, precision), seq))
+    return sorted(cells)
+
+
+def project_onto_segment(point, a, b):
+    """
+    Closest approach of segment a -> b to point, as (t, distance_km) where t
+    in [0, 1] is how far along the segment it is. Uses a flat projection
+    around the point, which is accurate at city scale.
+    """
+    km_per_degree_lng = KM_PER_DEGREE_LAT * math.cos(math.radians(point[0]))
+    ax, ay = (a[1] - point[1]) * km_per_degree_lng, (a[0] - point[0]) * KM_PER_DEGREE_LAT
+    dx, dy = (b[1] - a[1]) * km_per_degree_lng, (b[0] - a[0]) * KM_PER_DEGREE_LAT
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / length_sq))
+    return t, math.hypot(ax + t * dx, ay + t * dy)
+
+
+def best_route_insertion(points, pickup, dropoff, radius_km):
+    """
+    How a passenger going pickup -> dropoff best fits a route through points.
+    Both must lie within radius_km of the route, with the pickup no later
+    along it than the drop-off. Returns (detour_km, pickup_distance_km,
+    dropoff_distance_km) for the placement adding the least distance to the
+    driver's trip, or None if the route doesn't pass both in that order.
+    """
+    segments = list(zip(points, points[1:]))
+    pickups = [(seq, *project_onto_segment(pickup, a, b)) for seq, (a, b) in enumerate(segments)]
+    dropoffs = [(seq, *project_onto_segment(dropoff, a, b)) for seq, (a, b) in enumerate(segments)]
+
+    best = None
+    for p_seq, p_t, p_distance in pickups:
+        if p_distance > radius_km:
+            continue
+        a, b = segments[p_seq]
+        for d_seq, d_t, d_distance in dropoffs:
+            if d_distance > radius_km or (d_seq, d_t) < (p_seq, p_t):
+                continue
+            if d_seq == p_seq:
+                # Both stops on one segment: a -> pickup -> dropoff -> b instead of a -> b
+                detour = (haversine_km(*a, *pickup) + haversine_km(*pickup, *dropoff)
+                          + haversine_km(*dropoff, *b) - haversine_km(*a, *b))
+            else:
+                c, d = segments[d_seq]
+                detour = (haversine_km(*a, *pickup) + haversine_km(*pickup, *b) - haversine_km(*a, *b)
+                          + haversine_km(*c, *dropoff) + haversine_km(*dropoff, *d) - haversine_km(*c, *d))
+            detour = max(detour, 0.0)
+            if best is None or detour < best[0]:
+                best = (detour, p_distance, d_distance)
+    return best
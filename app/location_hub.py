@@ -0,0 +1,145 @@
+import threading
+import time
+from datetime import datetime, timezone
+from app import db
+from app.background import PeriodicFlusher
+from app.models import DriverLocation
+
+# Keep IN (...) lists well under every backend's bound-parameter limit
+FLUSH_CHUNK_SIZE = 500
+
+
+class LocationHub:
+    """
+    In-process store of each driver's latest GPS position.
+
+    Pings update memory only; a background flusher batch-upserts the drivers
+    that moved since the last flush into DriverLocation every
+    LOCATION_FLUSH_INTERVAL seconds. Reads prefer memory and fall back to the
+    table for drivers this process hasn't heard from. With several workers a
+    driver's socket may move to another worker, which then updates the
+    table; so there memory is only trusted for positions younger than one
+    flush interval, after which the table is at least as fresh.
+    """
+
+    def __init__(self):
+        self._positions = {}  # driver_id -> (lat, lng, updated_at)
+        self._dirty = set()
+        self._dirty_since = None
+        self._lock = threading.Lock()
+        self._flusher = PeriodicFlusher('location-hub', self.flush)
+        # Whether this process sees every ping (one worker); see get()
+        self.coherent = True
+
+        # Durability metrics
+        self.pings_received = 0
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.rows_flushed = 0
+        self.last_flush_at = None
+        self.last_flush_ms = None
+
+    def init_app(self, app):
+        self._flusher.init_app(app, app.config.get('LOCATION_FLUSH_INTERVAL', 5.0))
+        self.coherent = app.config.get('WEB_CONCURRENCY', 1) <= 1
+
+    def update(self, driver_id, lat, lng):
+        """Records a ping. No database access."""
+        driver_id = int(driver_id)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._positions[driver_id] = (lat, lng, now)
+            if not self._dirty:
+                self._dirty_since = now
+            self._dirty.add(driver_id)
+            self.pings_received += 1
+        self._flusher.start()
+
+    def get(self, driver_id):
+        """
+        Returns the driver's position in DriverLocation.to_dict() shape, or None
+        if unknown here or, with several workers, older than a flush interval
+        (the driver may be pinging another worker; read the table instead).
+        """
+        position = self._positions.get(int(driver_id))
+        if not position:
+            return None
+        lat, lng, updated_at = position
+        if not self.coherent:
+            age = (datetime.now(timezone.utc) - updated_at).total_seconds()
+            if age > self._flusher.interval:
+                return None
+        return {
+            'driver_id': int(driver_id),
+            'latitude': lat,
+            'longitude': lng,
+            'updated_at': updated_at.isoformat()
+        }
+
+    def flush(self):
+        """Upserts every dirty position into DriverLocation. Needs an app context."""
+        with self._lock:
+            batch = {driver_id: self._positions[driver_id] for driver_id in self._dirty}
+            self._dirty = set()
+            dirty_since = self._dirty_since
+            self._dirty_since = None
+
+        if not batch:
+            return
+
+        started = time.monotonic()
+        try:
+            driver_ids = list(batch)
+            for i in range(0, len(driver_ids), FLUSH_CHUNK_SIZE):
+                chunk = driver_ids[i:i + FLUSH_CHUNK_SIZE]
+                existing = {
+                    loc.driver_id: loc
+                    for loc in DriverLocation.query.filter(DriverLocation.driver_id.in_(chunk))
+                }
+                for driver_id in chunk:
+                    lat, lng, updated_at = batch[driver_id]
+                    loc = existing.get(driver_id)
+                    if not loc:
+                        loc = DriverLocation(driver_id=driver_id)
+                        db.session.add(loc)
+                    loc.latitude = lat
+                    loc.longitude = lng
+                    loc.updated_at = updated_at
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Put the batch back so the next flush retries it
+            with self._lock:
+                self._dirty.update(batch)
+                if dirty_since and (self._dirty_since is None or dirty_since < self._dirty_since):
+                    self._dirty_since = dirty_since
+                self.flush_failures += 1
+            raise
+
+        with self._lock:
+            self.flush_count += 1
+            self.rows_flushed += len(batch)
+            self.last_flush_at = datetime.now(timezone.utc)
+            self.last_flush_ms = round((time.monotonic() - started) * 1000, 2)
+
+    def stats(self):
+        with self._lock:
+            unflushed_age = None
+            if self._dirty_since:
+                unflushed_age = round((datetime.now(timezone.utc) - self._dirty_since).total_seconds(), 3)
+            return {
+                'coherent': self.coherent,
+                'tracked_drivers': len(self._positions),
+                'pings_received': self.pings_received,
+                'pending_rows': len(self._dirty),
+                'oldest_unflushed_age_sec': unflushed_age,
+                'flush_interval_sec': self._flusher.interval,
+                'flush_count': self.flush_count,
+                'flush_failures': self.flush_failures,
+                'rows_flushed': self.rows_flushed,
+                'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None,
+                'last_flush_ms': self.last_flush_ms
+            }
+
+
+location_hub = LocationHub()
@@ -0,0 +1,255 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from functools import wraps
+from flask import Blueprint, Response, current_app, g, request
+from socketio import Manager
+from sqlalchemy import event
+from app import db, socketio
+
+logger = logging.getLogger(__name__)
+
+# Seconds; HTTP requests, Socket.IO handlers and pool checkouts
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Recipients of one emit
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {count}'
+
+
+class Gauge:
+    """Read at scrape time from `collect`, which returns {label values tuple: value}."""
+
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in self.collect().items():
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+http_requests = Counter('http_requests_total', 'HTTP requests handled.', ['method', 'route', 'status'])
+http_latency = Histogram('http_request_duration_seconds', 'HTTP request latency.', ['method', 'route'])
+socket_events = Counter('socketio_events_total', 'Socket.IO events received.', ['event'])
+socket_latency = Histogram('socketio_event_duration_seconds', 'Socket.IO event handler latency.', ['event'])
+socket_fanout = Histogram('socketio_emit_recipients', 'Recipients of each Socket.IO emit.', ['event'],
+                          buckets=FANOUT_BUCKETS)
+pool_checkout = Histogram('db_pool_checkout_duration_seconds',
+                          'Time to get a connection from the pool, including waiting for a free one.')
+
+
+def _pool_gauges():
+    pool = db.engine.pool
+    # Only QueuePool reports occupancy; other pool classes have nothing to show
+    if not hasattr(pool, 'checkedout'):
+        return {}
+    return {('size',): pool.size(), ('checked_out',): pool.checkedout(),
+            ('checked_in',): pool.checkedin(), ('overflow',): max(pool.overflow(), 0)}
+
+
+def _room_gauges():
+    rooms = socketio.server.manager.rooms.get('/', {})
+    connected = rooms.get(None, {})
+    counts = {}
+    for room in rooms:
+        # Skip the all-clients room and each client's own sid room
+        if room is None or room in connected:
+            continue
+        kind = (str(room).split('_', 1)[0],)
+        counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+def _connection_gauges():
+    return {(): len(socketio.server.manager.rooms.get('/', {}).get(None, {}))}
+
+
+REGISTRY = [
+    http_requests, http_latency, socket_events, socket_latency, socket_fanout, pool_checkout,
+    Gauge('db_pool_connections', 'Connection pool occupancy.', ['state'], _pool_gauges),
+    Gauge('socketio_rooms', 'Socket.IO rooms by name prefix (tracking, ride, user).', ['kind'], _room_gauges),
+    Gauge('socketio_connections', 'Connected Socket.IO clients.', [], _connection_gauges),
+]
+
+
+def register(metric):
+    """Adds a metric defined elsewhere (e.g. by app/db_concurrency.py) to the exposition."""
+    if metric not in REGISTRY:
+        REGISTRY.append(metric)
+
+
+class MeteredManager(Manager):
+    """Socket.IO client manager that records how many local clients each emit reaches."""
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        rooms = self.rooms.get(namespace, {})
+        target = to or room
+        if isinstance(target, (list, tuple)):
+            recipients = sum(len(rooms.get(r, ())) for r in target)
+        else:
+            recipients = len(rooms.get(target, ()))
+        socket_fanout.observe(recipients, event)
+        return super().emit(event, data, namespace, room=room, skip_sid=skip_sid, callback=callback,
+                            to=to, **kwargs)
+
+
+def _metered_handler(event_name, handler):
+    @wraps(handler)
+    def metered(*args):
+        started = time.perf_counter()
+        try:
+            return handler(*args)
+        finally:
+            socket_latency.observe(time.perf_counter() - started, event_name)
+            socket_events.inc(event_name)
+    metered.metered = True
+    return metered
+
+
+def _meter_pool(engine):
+    connect = engine.pool.connect
+
+    def metered_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_checkout.observe(time.perf_counter() - started)
+    engine.pool.connect = metered_connect
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_latency.observe(time.perf_counter() - started, request.method, route)
+        http_requests.inc(request.method, route, str(response.status_code))
+    return response
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def expose_metrics():
+    """
+    Prometheus text exposition of this worker's metrics. Scrapers must send
+    METRICS_TOKEN as a bearer token.
+    """
+    expected = f"Bearer {current_app.config['METRICS_TOKEN']}"
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return Response('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    """
+    Installs the request hooks, wraps the registered Socket.IO handlers and the
+    pool, and serves /metrics. Call after the Socket.IO handler modules are imported.
+    Does nothing unless METRICS_TOKEN is set, so /metrics is never public.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if not app.config.get('METRICS_TOKEN'):
+        logger.warning("METRICS_TOKEN is not set; /metrics is disabled")
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.register_blueprint(metrics_bp)
+
+    for namespace, handlers in socketio.server.handlers.items():
+        for event_name, handler in handlers.items():
+            if not getattr(handler, 'metered', False):
+                handlers[event_name] = _metered_handler(event_name, handler)
+
+    with app.app_context():
+        engine = db.engine
+        _meter_pool(engine)
+        # dispose() swaps in a fresh pool
+        event.listen(engine, 'engine_disposed', _meter_pool)
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.geo import encode_geohash, encode_polyline, route_points, route_cells
 
 class User(db.Model):
     """
@@ -27,6 +28,18 @@ class User(db.Model):
     average_rating = db.Column(db.Float, default=5.0) 
     total_ride_count = db.Column(db.Integer, default=0)
 
+    # Running review aggregates, maintained with SQL-side increments on each review
+    rating_sum = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_1_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_2_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_3_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_4_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_5_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    # Incremented to revoke every access token issued before (see app/tokens.py)
+    token_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
     # Relationships (drivers can have multiple vehicles)
     vehicles = db.relationship('Vehicle', backref='owner', lazy='dynamic')
 
@@ -36,6 +49,10 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    def rating_histogram(self):
+        """Review counts per star, e.g. {1: 0, 2: 1, 3: 0, 4: 7, 5: 30}."""
+        return {stars: getattr(self, f'rating_{stars}_count') or 0 for stars in range(1, 6)}
+
     def __repr__(self):
         return f'<User {self.full_name} ({self.role})>'
     
@@ -45,7 +62,7 @@ class Vehicle(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     # This foreign key links the vehicle back to its owner
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id')) 
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     
     # Optional fields
     make = db.Column(db.String(50), nullable=True)
@@ -75,6 +92,20 @@ class Ride(db.Model):
     # Trip Details
     origin = db.Column(db.String(200), nullable=False)
     destination = db.Column(db.String(200), nullable=False)
+    # Normalized place entries backing origin/destination search (see app/places.py)
+    origin_place_id = db.Column(db.Integer, db.ForeignKey('place.id'), nullable=True, index=True)
+    destination_place_id = db.Column(db.Integer, db.ForeignKey('place.id'), nullable=True, index=True)
+
+    # Optional coordinates, with geohashes maintained on write for proximity search (see app/geo.py)
+    origin_lat = db.Column(db.Float, nullable=True)
+    origin_lng = db.Column(db.Float, nullable=True)
+    origin_geohash = db.Column(db.String(12), nullable=True, index=True)
+    destination_lat = db.Column(db.Float, nullable=True)
+    destination_lng = db.Column(db.Float, nullable=True)
+    destination_geohash = db.Column(db.String(12), nullable=True, index=True)
+    # Ordered stops between origin and destination as an encoded polyline, with the
+    # whole route's cells indexed in ride_route_cell for along-the-route matching
+    waypoints_polyline = db.Column(db.Text, nullable=True)
     departure_time = db.Column(db.DateTime(timezone=True), nullable=False)
     
     # Capacity and Status
@@ -84,9 +115,41 @@ class Ride(db.Model):
     # Status: 'open', 'full', 'completed', 'canceled'
     status = db.Column(db.String(20), default='open', nullable=False) 
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Bumped on every change to the ride or its bookings; drives conditional GETs (see app/conditional.py)
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
     
+    __table_args__ = (
+        # Search and nearby: open rides departing after now
+        db.Index('ix_ride_status_departure_time', 'status', 'departure_time'),
+        # Driver dashboard: a driver's rides, newest departure first
+        db.Index('ix_ride_driver_departure_time', 'driver_id', 'departure_time'),
+    )
+
     # Relationship to bookings via the join table (PassengerRide)
     bookings = db.relationship('PassengerRide', backref='ride', lazy='dynamic')
+    route_index = db.relationship('RideRouteCell', cascade='all, delete-orphan')
+
+    def set_origin_point(self, point):
+        """Sets (lat, lng) for the origin, or clears it when point is None."""
+        self.origin_lat, self.origin_lng = point or (None, None)
+        self.origin_geohash = encode_geohash(*point) if point else None
+
+    def set_destination_point(self, point):
+        """Sets (lat, lng) for the destination, or clears it when point is None."""
+        self.destination_lat, self.destination_lng = point or (None, None)
+        self.destination_geohash = encode_geohash(*point) if point else None
+
+    def set_waypoints(self, points):
+        """Sets the ordered (lat, lng) stops between origin and destination."""
+        self.waypoints_polyline = encode_polyline(points) if points else None
+
+    def index_route(self):
+        """Rebuilds route_index after any of origin, waypoints, destination or departure_time changed."""
+        points = route_points(self.origin_lat, self.origin_lng, self.waypoints_polyline,
+                              self.destination_lat, self.destination_lng)
+        self.route_index = [RideRouteCell(cell=cell, seq=seq, departure_time=self.departure_time)
+                            for cell, seq in route_cells(points)]
 
     def to_dict(self):
         return {
@@ -95,6 +158,11 @@ class Ride(db.Model):
             'vehicle_id': self.vehicle_id,
             'origin': self.origin,
             'destination': self.destination,
+            'origin_lat': self.origin_lat,
+            'origin_lng': self.origin_lng,
+            'destination_lat': self.destination_lat,
+            'destination_lng': self.destination_lng,
+            'waypoints_polyline': self.waypoints_polyline,
             'departure_time': self.departure_time.isoformat(),
             'available_seats': self.available_seats,
             'status': self.status
@@ -117,8 +185,44 @@ class PassengerRide(db.Model):
     booked_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
     # Ensure a passenger can only book one entry per ride
+    # (its index also serves lookups by passenger_id)
     __table_args__ = (
         db.UniqueConstraint('passenger_id', 'ride_id', name='uq_passenger_ride_booking'),
+        # A ride's bookings, optionally by status (driver dashboard, active booking checks)
+        db.Index('ix_passenger_ride_ride_status', 'ride_id', 'status'),
+    )
+
+# --- Place Search Index ---
+
+class Place(db.Model):
+    """A distinct place name, case and accent folded, referenced by rides."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), unique=True, nullable=False)
+
+    grams = db.relationship('PlaceGram', backref='place', lazy='dynamic', cascade='all, delete-orphan')
+
+class PlaceGram(db.Model):
+    """Posting list entry: one n-gram of a normalized place name."""
+    __tablename__ = 'place_gram'
+
+    gram = db.Column(db.String(8), primary_key=True)
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id'), primary_key=True)
+
+# --- Route Matching Index ---
+
+class RideRouteCell(db.Model):
+    """Posting list entry: a geohash cell that segment `seq` of a ride's route passes through."""
+    __tablename__ = 'ride_route_cell'
+
+    cell = db.Column(db.String(12), primary_key=True)
+    ride_id = db.Column(db.Integer, db.ForeignKey('ride.id'), primary_key=True, index=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Copied from the ride so lookups can skip rides that have already left
+    departure_time = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Match: upcoming rides through a cell, answered from the index alone
+        db.Index('ix_ride_route_cell_cell_departure', 'cell', 'departure_time', 'ride_id', 'seq'),
     )
 
 # --- Driver Tracking Model ---
@@ -149,17 +253,28 @@ class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ride_id = db.Column(db.Integer, db.ForeignKey('ride.id'), nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Set for direct messages only
+    receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # Server-assigned id that clients see before the row is written (see app/chat_pipeline.py)
+    uid = db.Column(db.String(32), unique=True, nullable=True)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
-    sender = db.relationship('User', backref=db.backref('sent_messages', lazy='dynamic'))
+    sender = db.relationship('User', foreign_keys=[sender_id], backref=db.backref('sent_messages', lazy='dynamic'))
 
-    def to_dict(self):
+    # History is paged per ride in (timestamp, id) order
+    __table_args__ = (
+        db.Index('ix_chat_message_ride_timestamp_id', 'ride_id', 'timestamp', 'id'),
+    )
+
+    def to_dict(self, sender_name=None):
+        # Pass sender_name when it was already fetched to avoid lazy-loading the sender
         return {
             'id': self.id,
+            'uid': self.uid,
             'ride_id': self.ride_id,
             'sender_id': self.sender_id,
-            'sender_name': self.sender.full_name,
+            'sender_name': sender_name if sender_name is not None else self.sender.full_name,
             'content': self.content,
             'timestamp': self.timestamp.isoformat()
         }
@@ -171,7 +286,7 @@ class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ride_id = db.Column(db.Integer, db.ForeignKey('ride.id'), nullable=False)
     reviewer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    reviewee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    reviewee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     rating = db.Column(db.Integer, nullable=False) 
     comment = db.Column(db.Text, nullable=True)
@@ -190,4 +305,16 @@ class Review(db.Model):
             'rating': self.rating,
             'comment': self.comment,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+# --- Admin Statistics ---
+
+class StatCounter(db.Model):
+    """A named running count (e.g. 'rides.status.open') served by the admin stats endpoint."""
+    __tablename__ = 'stat_counter'
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    # Last incremental update, and last time the value was recomputed from the source tables
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    reconciled_at = db.Column(db.DateTime(timezone=True), nullable=True)
@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def get_page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Reads ?limit= from the query string, clamped to [1, maximum]."""
+    try:
+        limit = int(request.args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(sort_value, row_id):
+    """Packs a (datetime, id) keyset position into an opaque URL-safe token."""
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on anything malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(sort_column, id_column, cursor, descending=False):
+    """
+    Builds the keyset predicate for rows strictly after the cursor position
+    in (sort_column, id_column) order.
+    """
+    sort_value, row_id = decode_cursor(cursor)
+    if descending:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
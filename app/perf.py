@@ -0,0 +1,174 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text kept for the slow-request log
+STATEMENT_PREVIEW = 500
+
+
+def _percentile(sorted_values, pct):
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class RequestMonitor:
+    """
+    Per-request SQL and latency instrumentation.
+
+    Request hooks time each request; engine cursor events count its
+    statements and the time spent in them. Each finished request is added
+    to a rolling window of PERF_WINDOW samples per route, and requests
+    slower than PERF_SLOW_REQUEST_MS are logged with their
+    PERF_SLOW_STATEMENTS slowest statements and kept for the admin summary.
+    Statements run outside a request (background flushers, CLI) are ignored.
+    """
+
+    def __init__(self):
+        self._routes = {}  # 'METHOD endpoint' -> deque of (wall_ms, db_ms, queries)
+        self._slow = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.slow_ms = 500.0
+        self.window = 1000
+        self.slow_statements = 5
+        self.requests = 0
+        self.slow_requests = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PERF_ENABLED', True)
+        self.slow_ms = app.config.get('PERF_SLOW_REQUEST_MS', 500.0)
+        self.window = app.config.get('PERF_WINDOW', 1000)
+        self.slow_statements = app.config.get('PERF_SLOW_STATEMENTS', 5)
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+            event.listen(db.engine, 'handle_error', self._execute_failed)
+
+    # --- hooks ---
+
+    @staticmethod
+    def _start_request():
+        g.perf = {'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'statements': []}
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('perf_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['perf_started'].pop()
+        perf = g.get('perf') if has_request_context() else None
+        if perf is None:
+            return
+        perf['queries'] += 1
+        perf['db_time'] += elapsed
+        # Min-heap of the slowest statements seen so far in this request
+        entry = (elapsed, perf['queries'], statement)
+        if len(perf['statements']) < self.slow_statements:
+            heapq.heappush(perf['statements'], entry)
+        elif self.slow_statements:
+            heapq.heappushpop(perf['statements'], entry)
+
+    @staticmethod
+    def _execute_failed(context):
+        # A failing statement never reaches after_cursor_execute; drop its start time
+        # so the connection's stack doesn't grow or time the next statement from it
+        started = context.connection.info.get('perf_started') if context.connection is not None else None
+        if context.execution_context is not None and started:
+            started.pop()
+
+    def _after_request(self, response):
+        self._finish(response.status_code)
+        return response
+
+    def _teardown_request(self, exc=None):
+        # Only reached with g.perf still set when the request failed before after_request
+        if g.get('perf') is not None:
+            self._finish(500)
+
+    def _finish(self, status):
+        perf = g.pop('perf', None)
+        if perf is None:
+            return
+        wall_ms = (time.perf_counter() - perf['started']) * 1000
+        db_ms = perf['db_time'] * 1000
+        route = f"{request.method} {request.endpoint or request.path}"
+
+        slow = None
+        if wall_ms >= self.slow_ms:
+            slow = {
+                'route': route,
+                'path': request.full_path.rstrip('?'),
+                'status': status,
+                'wall_ms': round(wall_ms, 2),
+                'db_ms': round(db_ms, 2),
+                'queries': perf['queries'],
+                'slowest_statements': [
+                    {'ms': round(elapsed * 1000, 2), 'statement': statement[:STATEMENT_PREVIEW]}
+                    for elapsed, _, statement in sorted(perf['statements'], reverse=True)
+                ]
+            }
+            logger.warning(
+                "Slow request %s (%s): %.1f ms, %d queries, %.1f ms in DB%s", slow['path'], route, wall_ms,
+                perf['queries'], db_ms,
+                ''.join(f"\n  %.1f ms: %s" % (s['ms'], ' '.join(s['statement'].split()))
+                        for s in slow['slowest_statements'])
+            )
+
+        with self._lock:
+            samples = self._routes.get(route)
+            if samples is None:
+                samples = self._routes[route] = deque(maxlen=self.window)
+            samples.append((wall_ms, db_ms, perf['queries']))
+            self.requests += 1
+            if slow:
+                self.slow_requests += 1
+                self._slow.append(slow)
+
+    # --- reporting ---
+
+    def summary(self):
+        """Rolling per-route latency and query figures, slowest p95 first, plus recent slow requests."""
+        with self._lock:
+            routes = {route: list(samples) for route, samples in self._routes.items()}
+            slow = list(self._slow)
+            totals = {'requests': self.requests, 'slow_requests': self.slow_requests}
+
+        summaries = []
+        for route, samples in routes.items():
+            wall = sorted(sample[0] for sample in samples)
+            summaries.append({
+                'route': route,
+                'samples': len(samples),
+                'p50_ms': round(_percentile(wall, 50), 2),
+                'p95_ms': round(_percentile(wall, 95), 2),
+                'p99_ms': round(_percentile(wall, 99), 2),
+                'mean_db_ms': round(sum(sample[1] for sample in samples) / len(samples), 2),
+                'mean_queries': round(sum(sample[2] for sample in samples) / len(samples), 2),
+                'max_queries': max(sample[2] for sample in samples)
+            })
+        summaries.sort(key=lambda s: s['p95_ms'], reverse=True)
+
+        return {
+            'enabled': self.enabled,
+            'slow_request_ms': self.slow_ms,
+            'window': self.window,
+            **totals,
+            'routes': summaries,
+            'recent_slow_requests': slow[::-1]
+        }
+
+
+request_monitor = RequestMonitor()
@@ -0,0 +1,85 @@
+import re
+import unicodedata
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Place, PlaceGram
+
+# Trigrams: short enough that partial names ("kimi") still hit the index,
+# long enough that each posting list stays small.
+NGRAM_SIZE = 3
+
+
+def normalize_place_name(name):
+    """
+    Folds case, accents and punctuation so that e.g. 'Nyabugogo', ' NYABÚGOGO '
+    and 'nyabugogo.' all map to the same key.
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'\w+', stripped.casefold()))
+
+
+def place_ngrams(normalized_name):
+    """Returns the set of NGRAM_SIZE-character substrings of an already normalized name."""
+    return {normalized_name[i:i + NGRAM_SIZE] for i in range(len(normalized_name) - NGRAM_SIZE + 1)}
+
+
+def get_or_create_place(name, cache=None):
+    """
+    Returns the Place for a free-text name, creating it and its n-gram postings
+    on first use. Runs inside the caller's transaction.
+    """
+    key = normalize_place_name(name)
+    if not key:
+        return None
+
+    if cache is not None and key in cache:
+        return cache[key]
+
+    place = Place.query.filter_by(name=key).first()
+    if not place:
+        try:
+            # Savepoint so a concurrent insert of the same name doesn't abort the caller's transaction
+            with db.session.begin_nested():
+                place = Place(name=key)
+                db.session.add(place)
+                db.session.flush()
+                db.session.add_all(PlaceGram(gram=gram, place_id=place.id) for gram in place_ngrams(key))
+        except IntegrityError:
+            place = Place.query.filter_by(name=key).first()
+
+    if cache is not None:
+        cache[key] = place
+    return place
+
+
+def place_id_for(name):
+    """Convenience wrapper returning just the place id (or None for an empty name)."""
+    place = get_or_create_place(name)
+    return place.id if place else None
+
+
+def match_place_ids(text):
+    """
+    Returns the ids of places whose normalized name contains the normalized text,
+    or None if the text normalizes to nothing (i.e. no filter should apply).
+    """
+    key = normalize_place_name(text)
+    if not key:
+        return None
+
+    grams = place_ngrams(key)
+    query = db.session.query(Place.id, Place.name)
+    if grams:
+        # Places that contain every trigram of the query
+        candidates = db.session.query(PlaceGram.place_id).filter(
+            PlaceGram.gram.in_(grams)
+        ).group_by(PlaceGram.place_id).having(func.count(PlaceGram.gram) == len(grams))
+        query = query.filter(Place.id.in_(candidates))
+    else:
+        # Query shorter than one n-gram: scan the (small) place table, never the ride table
+        query = query.filter(Place.name.contains(key, autoescape=True))
+
+    # Having every trigram doesn't guarantee a substring match ('abab' vs 'bab aba'), so confirm it
+    return [place_id for place_id, name in query if key in name]
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models import User, Review
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.user_cache import invalidate_user
+from sqlalchemy import update, cast
 
 review_bp = Blueprint('review', __name__)
 
@@ -17,22 +19,32 @@ def submit_review():
     if not all(key in data for key in ['ride_id', 'reviewee_id', 'rating']):
         return jsonify({"msg": "Missing required fields"}), 400
 
+    rating = data['rating']
+    # bool is an int subclass; true/false are not ratings
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({"msg": "Rating must be an integer from 1 to 5"}), 400
+
     new_review = Review(
         ride_id=data['ride_id'],
         reviewer_id=user_id,
         reviewee_id=data['reviewee_id'],
-        rating=data['rating'],
+        rating=rating,
         comment=data.get('comment')
     )
+    db.session.add(new_review)
     
-    # Update average rating of the reviewee
-    reviewee = User.query.get(data['reviewee_id'])
-    if reviewee:
-        all_reviews = Review.query.filter_by(reviewee_id=reviewee.id).all()
-        current_total = sum([r.rating for r in all_reviews])
-        count = len(all_reviews)
-        reviewee.average_rating = (current_total + data['rating']) / (count + 1)
+    # Fold the rating into the reviewee's running aggregates in a single UPDATE,
+    # so submitting stays O(1) however many reviews they already have.
+    # average_rating goes first: MySQL evaluates SET clauses left to right.
+    db.session.execute(
+        update(User).where(User.id == data['reviewee_id']).ordered_values(
+            (User.average_rating, cast(User.rating_sum + rating, db.Float) / (User.rating_count + 1)),
+            (User.rating_sum, User.rating_sum + rating),
+            (User.rating_count, User.rating_count + 1),
+            (getattr(User, f'rating_{rating}_count'), getattr(User, f'rating_{rating}_count') + 1)
+        )
+    )
+    invalidate_user(db.session, data['reviewee_id'])
     
-    db.session.add(new_review)
     db.session.commit()
     return jsonify({"msg": "Review submitted successfully"}), 201
\ No newline at end of file
@@ -1,29 +1,138 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import User, Ride, Vehicle, PassengerRide
+from app.models import User, Ride, Vehicle, PassengerRide, RideRouteCell
+from app.pagination import get_page_size, encode_cursor, after_cursor
+from app.places import place_id_for, match_place_ids
+from app.stats import record_change
+from app.decorators import role_required
+from app.serialization import ride_row
+from app.conditional import make_etag, not_modified, tag
+from app.geo import (parse_point, parse_waypoints, covering_geohashes, geohash_prefix_filter, haversine_km,
+                     cells_within, route_points, best_route_insertion, ROUTE_CELL_PRECISION, ROUTE_SAMPLE_KM)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone 
-from sqlalchemy import or_
+from sqlalchemy import case, func, or_, update
 from sqlalchemy.exc import IntegrityError
 
 
 ride_bp = Blueprint('ride', __name__) 
 
-def is_driver(user):
-    """Checks if the user has a 'driver' or 'both' role."""
-    return user and user.role in ['driver', 'both']
+# Ride columns plus the driver's name and rating, for search results
+ride_with_driver_row = ride_row.extend(driver_name=User.full_name, driver_rating=User.average_rating)
+
+DEFAULT_NEARBY_RADIUS_KM = 2.0
+MAX_NEARBY_RADIUS_KM = 50.0
+# Walking distance to or from the route
+DEFAULT_MATCH_RADIUS_KM = 0.5
+MAX_MATCH_RADIUS_KM = 2.0
+
+def parse_list_arg(name):
+    """Reads a comma-separated query parameter (e.g. ?status=open,full) into a list."""
+    value = request.args.get(name)
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def parse_time_arg(name):
+    """Reads an ISO 8601 date/time query parameter as a naive UTC datetime, or None."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def reserve_seats(ride_id, seats):
+    """
+    Atomically takes seats from an open ride inside the current transaction.
+    The conditional UPDATE only matches while enough seats remain, so concurrent
+    bookings can neither oversell nor need to lock the row up front.
+    Returns False if the seats could not be reserved.
+    """
+    reserved = db.session.execute(
+        update(Ride)
+        .where(Ride.id == ride_id, Ride.status == 'open', Ride.available_seats >= seats)
+        .values(available_seats=Ride.available_seats - seats)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not reserved:
+        return False
+
+    # Our UPDATE holds the row lock, so this sees exactly the post-reservation count
+    filled = db.session.execute(
+        update(Ride)
+        .where(Ride.id == ride_id, Ride.status == 'open', Ride.available_seats == 0)
+        .values(status='full')
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if filled:
+        record_change(db.session, 'rides.status.open', -1)
+        record_change(db.session, 'rides.status.full', +1)
+    return True
+
+def release_seats(ride_id, seats):
+    """Atomically returns seats to a ride, reopening it if it was full."""
+    db.session.execute(
+        update(Ride)
+        .where(Ride.id == ride_id)
+        .values(available_seats=Ride.available_seats + seats)
+        .execution_options(synchronize_session=False)
+    )
+    reopened = db.session.execute(
+        update(Ride)
+        .where(Ride.id == ride_id, Ride.status == 'full')
+        .values(status='open')
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if reopened:
+        record_change(db.session, 'rides.status.full', -1)
+        record_change(db.session, 'rides.status.open', +1)
+
+def resize_ride(ride, total_seats):
+    """
+    Atomically changes a ride's capacity inside the current transaction: its
+    available seats move by the difference and its status follows them (open
+    while seats remain, full otherwise), in one conditional UPDATE, so a
+    concurrent reservation is never overwritten with a stale count. Matches
+    only while the booked seats fit and the status is still the one loaded
+    (which keeps the status counters exact). Returns False if it didn't match.
+    """
+    available = Ride.available_seats + (total_seats - Ride.total_seats)
+    resized = db.session.execute(
+        update(Ride)
+        .where(Ride.id == ride.id, Ride.status == ride.status,
+               Ride.total_seats - Ride.available_seats <= total_seats)
+        # status and available_seats go first: MySQL evaluates SET clauses left to right
+        .ordered_values(
+            (Ride.status, case((available > 0, 'open'), else_='full')),
+            (Ride.available_seats, available),
+            (Ride.total_seats, total_seats)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not resized:
+        return False
+
+    # Our UPDATE holds the row lock, so this is the status it just wrote
+    status = db.session.query(Ride.status).filter(Ride.id == ride.id).scalar()
+    if status != ride.status:
+        record_change(db.session, f'rides.status.{ride.status}', -1)
+        record_change(db.session, f'rides.status.{status}', +1)
+    db.session.expire(ride, ['status', 'available_seats', 'total_seats'])
+    return True
 
 # Driver Routes (Trip Management)
 
 # Create a new ride offering
 @ride_bp.route('/', methods=['POST'])
 @jwt_required()
+@role_required('driver', 'both', msg="Unauthorized: Only drivers can create rides")
 def create_ride():
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
-
-    if not is_driver(user):
-        return jsonify({"msg": "Unauthorized: Only drivers can create rides"}), 403
+    user_id = int(get_jwt_identity())
 
     data = request.get_json()
     
@@ -43,12 +152,18 @@ def create_ride():
             departure_time_str = departure_time_str.replace('Z', '')
             
         departure_time = datetime.fromisoformat(departure_time_str)
+
+        # Optional coordinates for proximity search
+        origin_point = parse_point(data, 'origin_lat', 'origin_lng')
+        destination_point = parse_point(data, 'destination_lat', 'destination_lng')
+        # Optional ordered stops in between, for route matching
+        waypoints = parse_waypoints(data.get('waypoints'))
         
     except (ValueError, TypeError) as e:
          return jsonify({"msg": f"Invalid data type or format. Error: {str(e)}"}), 400
 
     vehicle = Vehicle.query.get(vehicle_id)
-    if not vehicle or vehicle.owner_id != user.id:
+    if not vehicle or vehicle.owner_id != user_id:
         return jsonify({"msg": "Invalid vehicle ID or vehicle not owned by user."}), 400
     
     if total_seats > vehicle.seat_capacity:
@@ -59,7 +174,7 @@ def create_ride():
 
     try:
         new_ride = Ride(
-            driver_id=user.id,
+            driver_id=user_id,
             vehicle_id=vehicle_id,
             origin=data.get('origin'),
             destination=data.get('destination'),
@@ -68,6 +183,13 @@ def create_ride():
             available_seats=total_seats, 
             status='open'
         )
+        # Keep the place index in step with the ride's free-text endpoints
+        new_ride.origin_place_id = place_id_for(new_ride.origin)
+        new_ride.destination_place_id = place_id_for(new_ride.destination)
+        new_ride.set_origin_point(origin_point)
+        new_ride.set_destination_point(destination_point)
+        new_ride.set_waypoints(waypoints)
+        new_ride.index_route()
         db.session.add(new_ride)
         db.session.commit()
         
@@ -110,32 +232,38 @@ def update_ride(ride_id):
             
             ride.departure_time = datetime.fromisoformat(departure_time_str)
             
-        # Update seat capacity (handle logic if total seats decreases)
+        # Update seat capacity; bookings may land concurrently, so only in SQL
         if 'total_seats' in data:
             new_total_seats = int(data['total_seats'])
-            if new_total_seats < ride.total_seats:
-                # If capacity is reduced, ensure it doesn't drop below current bookings
+            if not resize_ride(ride, new_total_seats):
+                db.session.rollback()
                 occupied_seats = ride.total_seats - ride.available_seats
                 if new_total_seats < occupied_seats:
                     return jsonify({"msg": f"Cannot reduce total seats below {occupied_seats} (currently booked)."}), 400
-                
-                # Adjust available seats based on the reduction
-                ride.available_seats -= (ride.total_seats - new_total_seats)
-
-            elif new_total_seats > ride.total_seats:
-                # If capacity increases, increase available seats
-                ride.available_seats += (new_total_seats - ride.total_seats)
-            
-            ride.total_seats = new_total_seats
-            # Ensure status is 'open' if seats become available
-            if ride.available_seats > 0:
-                ride.status = 'open'
+                return jsonify({"msg": "Ride changed while updating; try again."}), 409
 
         # Update other fields
-        if 'origin' in data: ride.origin = data['origin']
-        if 'destination' in data: ride.destination = data['destination']
+        if 'origin' in data:
+            ride.origin = data['origin']
+            ride.origin_place_id = place_id_for(ride.origin)
+        if 'destination' in data:
+            ride.destination = data['destination']
+            ride.destination_place_id = place_id_for(ride.destination)
         if 'vehicle_id' in data: ride.vehicle_id = int(data['vehicle_id'])
 
+        # Coordinates (send both lat and lng; null for both clears them)
+        if 'origin_lat' in data or 'origin_lng' in data:
+            ride.set_origin_point(parse_point(data, 'origin_lat', 'origin_lng'))
+        if 'destination_lat' in data or 'destination_lng' in data:
+            ride.set_destination_point(parse_point(data, 'destination_lat', 'destination_lng'))
+        # Replaces all waypoints; null or [] clears them
+        if 'waypoints' in data:
+            ride.set_waypoints(parse_waypoints(data['waypoints']))
+
+        route_keys = ('origin_lat', 'origin_lng', 'destination_lat', 'destination_lng', 'waypoints', 'departure_time')
+        if any(key in data for key in route_keys):
+            ride.index_route()
+
         db.session.commit()
         return jsonify({"msg": "Ride updated successfully", "id": ride.id}), 200
         
@@ -190,27 +318,74 @@ def delete_ride(ride_id):
 @ride_bp.route('/driver', methods=['GET'])
 @jwt_required()
 def get_driver_rides():
+    # Query parameters: ?status=open,full&from=2025-01-01&to=2025-02-01&limit=20&cursor=<next_cursor>
     user_id = get_jwt_identity()
-    
-    # Includes logic to fetch associated bookings for history/oversight
-    rides = Ride.query.filter_by(driver_id=int(user_id)).order_by(Ride.departure_time.desc()).all()
-    
+    cursor = request.args.get('cursor')
+
+    try:
+        limit = get_page_size()
+        statuses = parse_list_arg('status')
+        departs_from = parse_time_arg('from')
+        departs_to = parse_time_arg('to')
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # updated_at rides along (after the serialized columns) for the ETag
+    query = ride_row.query().add_columns(Ride.updated_at).filter(Ride.driver_id == int(user_id))
+    if statuses:
+        query = query.filter(Ride.status.in_(statuses))
+    if departs_from:
+        query = query.filter(Ride.departure_time >= departs_from)
+    if departs_to:
+        query = query.filter(Ride.departure_time < departs_to)
+
+    # Keyset pagination on (departure_time, id), newest first
+    if cursor:
+        try:
+            query = query.filter(after_cursor(Ride.departure_time, Ride.id, cursor, descending=True))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+    rides = query.order_by(Ride.departure_time.desc(), Ride.id.desc()).limit(limit + 1).all()
+
+    # Versioned by exactly the rides on this page; booking changes touch their
+    # ride's updated_at, so this covers the bookings too
+    etag = make_etag(user_id, *rides)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    has_more = len(rides) > limit
+    rides = rides[:limit]
+
+    # Bookings for the whole page in one query (7.5 Booking List for Driver)
+    bookings_by_ride = {ride.id: [] for ride in rides}
+    if rides:
+        bookings = db.session.query(
+            PassengerRide.id, PassengerRide.ride_id, PassengerRide.passenger_id,
+            PassengerRide.seats_booked, PassengerRide.status
+        ).filter(
+            PassengerRide.ride_id.in_(bookings_by_ride.keys())
+        ).order_by(PassengerRide.id).all()
+        for b in bookings:
+            bookings_by_ride[b.ride_id].append({
+                'booking_id': b.id,
+                'passenger_id': b.passenger_id,
+                'seats_booked': b.seats_booked,
+                'status': b.status
+            })
+
     ride_list = []
     for ride in rides:
-        ride_dict = ride.to_dict()
-        
-        # Fetch bookings for this ride (7.5 Booking List for Driver)
-        bookings = PassengerRide.query.filter_by(ride_id=ride.id).all()
-        ride_dict['bookings'] = [{
-            'booking_id': b.id,
-            'passenger_id': b.passenger_id,
-            'seats_booked': b.seats_booked,
-            'status': b.status
-        } for b in bookings]
-        
+        ride_dict = ride_row.dump(ride)
+        ride_dict['bookings'] = bookings_by_ride[ride.id]
         ride_list.append(ride_dict)
 
-    return jsonify(ride_list), 200
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rides[-1].departure_time, rides[-1].id)
+
+    return tag(jsonify({"rides": ride_list, "next_cursor": next_cursor}), etag), 200
 
 
 # --- Passenger Routes ---
@@ -218,41 +393,218 @@ def get_driver_rides():
 # Find open rides
 @ride_bp.route('/search', methods=['GET'])
 def search_rides():
-    # Query parameters: ?origin=Kimironko&destination=Kacyiru
+    # Query parameters: ?origin=Kimironko&destination=Kacyiru&limit=20&cursor=<next_cursor>
     origin_query = request.args.get('origin')
     destination_query = request.args.get('destination')
+    cursor = request.args.get('cursor')
+
+    try:
+        limit = get_page_size()
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Rides and their driver's name/rating come back in a single joined query, as plain
+    # rows; updated_at rides along (after the serialized columns) for the ETag
+    query = ride_with_driver_row.query().add_columns(Ride.updated_at).join(
+        User, Ride.driver_id == User.id
+    ).filter(
+        Ride.status == 'open',
+        # Filter out rides happening in the past
+        Ride.departure_time > now
+    )
     
-    query = Ride.query.filter_by(status='open')
-    
+    # Resolve the text filters through the place index instead of a LIKE scan over rides
     if origin_query:
-        query = query.filter(Ride.origin.ilike(f'%{origin_query}%'))
+        origin_place_ids = match_place_ids(origin_query)
+        if origin_place_ids is not None:
+            query = query.filter(Ride.origin_place_id.in_(origin_place_ids))
         
     if destination_query:
-        query = query.filter(Ride.destination.ilike(f'%{destination_query}%'))
+        destination_place_ids = match_place_ids(destination_query)
+        if destination_place_ids is not None:
+            query = query.filter(Ride.destination_place_id.in_(destination_place_ids))
+
+    # Keyset pagination on (departure_time, id)
+    if cursor:
+        try:
+            query = query.filter(after_cursor(Ride.departure_time, Ride.id, cursor))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Ride.departure_time.asc(), Ride.id.asc()).limit(limit + 1).all()
+
+    # Versioned by everything this page shows (plus the look-ahead row): a ride joining,
+    # leaving or changing within it, or a driver's name or rating changing, changes the tag
+    etag = make_etag(*rows)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    ride_list = ride_with_driver_row.dump_all(rows)
 
-    # Filter out rides happening in the past
-    query = query.filter(Ride.departure_time > datetime.now(timezone.utc).replace(tzinfo=None))
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].departure_time, rows[-1].id)
+        
+    return tag(jsonify({"rides": ride_list, "next_cursor": next_cursor}), etag), 200
+
+# Find open rides starting (and optionally ending) near given coordinates
+@ride_bp.route('/nearby', methods=['GET'])
+def nearby_rides():
+    # Query parameters: ?origin_lat=-1.95&origin_lng=30.06&origin_radius_km=2
+    #                   &destination_lat=-1.94&destination_lng=30.10&destination_radius_km=2&limit=20
+    try:
+        origin_point = parse_point(request.args, 'origin_lat', 'origin_lng')
+        destination_point = parse_point(request.args, 'destination_lat', 'destination_lng')
+        origin_radius = float(request.args.get('origin_radius_km', DEFAULT_NEARBY_RADIUS_KM))
+        destination_radius = float(request.args.get('destination_radius_km', DEFAULT_NEARBY_RADIUS_KM))
+        limit = get_page_size()
+    except (ValueError, TypeError) as e:
+        return jsonify({"msg": f"Invalid search parameters. Error: {str(e)}"}), 400
+
+    if not origin_point:
+        return jsonify({"msg": "origin_lat and origin_lng are required."}), 400
+
+    if not (0 < origin_radius <= MAX_NEARBY_RADIUS_KM and 0 < destination_radius <= MAX_NEARBY_RADIUS_KM):
+        return jsonify({"msg": f"Radius must be between 0 and {MAX_NEARBY_RADIUS_KM} km."}), 400
+
+    query = ride_with_driver_row.query().join(
+        User, Ride.driver_id == User.id
+    ).filter(
+        Ride.status == 'open',
+        Ride.departure_time > datetime.now(timezone.utc).replace(tzinfo=None),
+        # Coarse filter on indexed geohash cells; exact distances are checked below
+        geohash_prefix_filter(Ride.origin_geohash, covering_geohashes(*origin_point, origin_radius))
+    )
+
+    if destination_point:
+        query = query.filter(
+            geohash_prefix_filter(Ride.destination_geohash, covering_geohashes(*destination_point, destination_radius))
+        )
+
+    matches = []
+    for ride in query:
+        origin_distance = haversine_km(*origin_point, ride.origin_lat, ride.origin_lng)
+        if origin_distance > origin_radius:
+            continue
+
+        destination_distance = 0.0
+        if destination_point:
+            destination_distance = haversine_km(*destination_point, ride.destination_lat, ride.destination_lng)
+            if destination_distance > destination_radius:
+                continue
+
+        matches.append((origin_distance + destination_distance, origin_distance, destination_distance, ride))
+
+    # Closest first; departure time breaks ties
+    matches.sort(key=lambda m: (m[0], m[3].departure_time))
 
-    rides = query.order_by(Ride.departure_time.asc()).all()
-    
     ride_list = []
-    for ride in rides:
-        driver = User.query.get(ride.driver_id)
-        
-        ride_data = ride.to_dict()
-        ride_data['driver_name'] = driver.full_name
-        ride_data['driver_rating'] = driver.average_rating
-        
+    for _, origin_distance, destination_distance, ride in matches[:limit]:
+        ride_data = ride_with_driver_row.dump(ride)
+        ride_data['origin_distance_km'] = round(origin_distance, 3)
+        if destination_point:
+            ride_data['destination_distance_km'] = round(destination_distance, 3)
+
         ride_list.append(ride_data)
-        
+
+    return jsonify(ride_list), 200
+
+def route_cell_hits(point, radius_km, seq_aggregate, departs_after, departs_before=None):
+    """
+    Subquery of (ride_id, seq) for rides departing after departs_after and
+    before departs_before (exclusive, like ?to= elsewhere) whose route passes
+    within about radius_km of point, one seq per ride by seq_aggregate.
+    """
+    # Pad by half the sampling step so segments between samples are never missed
+    cells = cells_within(*point, radius_km + ROUTE_SAMPLE_KM / 2, ROUTE_CELL_PRECISION)
+
+    query = db.session.query(
+        RideRouteCell.ride_id.label('ride_id'), seq_aggregate(RideRouteCell.seq).label('seq')
+    ).filter(
+        # Equality on each cell lets the index seek straight to its upcoming rides
+        RideRouteCell.cell.in_(cells),
+        RideRouteCell.departure_time > departs_after
+    )
+    if departs_before:
+        query = query.filter(RideRouteCell.departure_time < departs_before)
+    return query.group_by(RideRouteCell.ride_id).subquery()
+
+# Find open rides whose route passes a passenger's pickup and then their drop-off
+@ride_bp.route('/match', methods=['GET'])
+def match_rides():
+    # Query parameters: ?pickup_lat=-1.94&pickup_lng=30.09&dropoff_lat=-1.94&dropoff_lng=30.05
+    #                   &radius_km=0.5&seats=1&from=2026-10-17T07:00&to=2026-10-17T10:00&limit=20
+    try:
+        pickup = parse_point(request.args, 'pickup_lat', 'pickup_lng')
+        dropoff = parse_point(request.args, 'dropoff_lat', 'dropoff_lng')
+        radius = float(request.args.get('radius_km', DEFAULT_MATCH_RADIUS_KM))
+        seats = int(request.args.get('seats', 1))
+        departs_from = parse_time_arg('from')
+        departs_to = parse_time_arg('to')
+        limit = get_page_size()
+    except (ValueError, TypeError) as e:
+        return jsonify({"msg": f"Invalid search parameters. Error: {str(e)}"}), 400
+
+    if not pickup or not dropoff:
+        return jsonify({"msg": "pickup_lat, pickup_lng, dropoff_lat and dropoff_lng are required."}), 400
+
+    if not 0 < radius <= MAX_MATCH_RADIUS_KM:
+        return jsonify({"msg": f"Radius must be between 0 and {MAX_MATCH_RADIUS_KM} km."}), 400
+
+    if seats < 1:
+        return jsonify({"msg": "seats must be at least 1."}), 400
+
+    # Coarse filter on the route cell index: some segment near the pickup no later
+    # than some segment near the drop-off. Exact distances and order are checked below.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    departs_after = max(now, departs_from) if departs_from else now
+    pickup_hits = route_cell_hits(pickup, radius, func.min, departs_after, departs_to)
+    dropoff_hits = route_cell_hits(dropoff, radius, func.max, departs_after, departs_to)
+
+    query = ride_with_driver_row.query().join(
+        pickup_hits, pickup_hits.c.ride_id == Ride.id
+    ).join(
+        dropoff_hits, dropoff_hits.c.ride_id == Ride.id
+    ).join(
+        User, Ride.driver_id == User.id
+    ).filter(
+        pickup_hits.c.seq <= dropoff_hits.c.seq,
+        Ride.status == 'open',
+        Ride.available_seats >= seats
+    )
+
+    matches = []
+    for ride in query:
+        points = route_points(ride.origin_lat, ride.origin_lng, ride.waypoints_polyline,
+                              ride.destination_lat, ride.destination_lng)
+        insertion = best_route_insertion(points, pickup, dropoff, radius)
+        if insertion:
+            matches.append((*insertion, ride))
+
+    # Smallest detour for the driver first; departure time breaks ties
+    matches.sort(key=lambda m: (m[0], m[3].departure_time))
+
+    ride_list = []
+    for detour, pickup_distance, dropoff_distance, ride in matches[:limit]:
+        ride_data = ride_with_driver_row.dump(ride)
+        ride_data['detour_km'] = round(detour, 3)
+        ride_data['pickup_distance_km'] = round(pickup_distance, 3)
+        ride_data['dropoff_distance_km'] = round(dropoff_distance, 3)
+        ride_list.append(ride_data)
+
     return jsonify(ride_list), 200
 
 # Create a new booking
 @ride_bp.route('/<int:ride_id>/book', methods=['POST'])
 @jwt_required()
 def create_booking(ride_id):
-    passenger_id = get_jwt_identity()
-    user = User.query.get(int(passenger_id))
+    passenger_id = int(get_jwt_identity())
 
     data = request.get_json()
     seats_requested = data.get('seats', 1) 
@@ -264,29 +616,33 @@ def create_booking(ride_id):
 
     if not ride: return jsonify({"msg": "Ride not found."}), 404
     if ride.status != 'open': return jsonify({"msg": "Ride is not available for booking."}), 400
-    if ride.driver_id == user.id: return jsonify({"msg": "Cannot book a seat on your own ride."}), 400
+    if ride.driver_id == passenger_id: return jsonify({"msg": "Cannot book a seat on your own ride."}), 400
     if seats_requested > ride.available_seats:
         return jsonify({"msg": f"Requested {seats_requested} seats, but only {ride.available_seats} available."}), 409
         
     existing_booking = PassengerRide.query.filter_by(
-        passenger_id=user.id, ride_id=ride.id
+        passenger_id=passenger_id, ride_id=ride.id
     ).first()
 
     if existing_booking:
         return jsonify({"msg": "You already have a booking for this ride."}), 409
 
     try:
+        # The checks above are advisory; the conditional UPDATE is what actually guards the seats
+        if not reserve_seats(ride.id, seats_requested):
+            db.session.rollback()
+            ride = Ride.query.get(ride_id)
+            if ride.status != 'open':
+                return jsonify({"msg": "Ride is not available for booking."}), 400
+            return jsonify({"msg": f"Requested {seats_requested} seats, but only {ride.available_seats} available."}), 409
+
         new_booking = PassengerRide(
-            passenger_id=user.id,
+            passenger_id=passenger_id,
             ride_id=ride.id,
             seats_booked=seats_requested,
             status='pending'
         )
         db.session.add(new_booking)
-        
-        ride.available_seats -= seats_requested
-        if ride.available_seats == 0:
-            ride.status = 'full'
 
         db.session.commit()
         
@@ -323,6 +679,7 @@ def approve_booking(booking_id):
 
     try:
         booking.status = 'confirmed'
+        ride.updated_at = datetime.now(timezone.utc)
         db.session.commit()
         
         return jsonify({
@@ -351,15 +708,22 @@ def cancel_booking(booking_id):
     if booking.status not in ['pending', 'confirmed']:
         return jsonify({"msg": f"Cannot cancel booking with status '{booking.status}'."}), 400
         
-    ride = Ride.query.get(booking.ride_id)
-
     try:
-        # Update the booking status
-        booking.status = 'canceled'
+        # Update the booking status, conditionally so only one concurrent cancel releases seats
+        canceled = db.session.execute(
+            update(PassengerRide)
+            .where(PassengerRide.id == booking.id, PassengerRide.status.in_(['pending', 'confirmed']))
+            .values(status='canceled')
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if not canceled:
+            db.session.rollback()
+            return jsonify({"msg": "Booking was already cancelled."}), 400
+        record_change(db.session, f'bookings.status.{booking.status}', -1)
+        record_change(db.session, 'bookings.status.canceled', +1)
         
-        # Release the seats back to the ride
-        ride.available_seats += booking.seats_booked
-        ride.status = 'open' # Ensure ride is set back to open if it was full
+        # Release the seats back to the ride (reopening it if it was full)
+        release_seats(booking.ride_id, booking.seats_booked)
 
         db.session.commit()
         
@@ -367,7 +731,7 @@ def cancel_booking(booking_id):
         return jsonify({
             "msg": "Booking cancelled successfully. Seats released.",
             "booking_id": booking.id,
-            "new_status": booking.status
+            "new_status": "canceled"
         }), 200
 
     except Exception as e:
@@ -378,16 +742,56 @@ def cancel_booking(booking_id):
 @ride_bp.route('/bookings', methods=['GET'])
 @jwt_required()
 def get_user_bookings():
+    # Query parameters: ?status=pending,confirmed&when=upcoming|past&limit=20&cursor=<next_cursor>
     passenger_id = get_jwt_identity()
-    
-    # Fetch all bookings the current user has made
-    bookings = PassengerRide.query.filter_by(passenger_id=int(passenger_id)).all()
-    
+    when = request.args.get('when')
+    cursor = request.args.get('cursor')
+
+    if when not in (None, 'upcoming', 'past'):
+        return jsonify({"msg": "when must be 'upcoming' or 'past'"}), 400
+    try:
+        limit = get_page_size()
+        statuses = parse_list_arg('status')
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # Bookings, their ride and the ride's driver in a single joined query
+    query = db.session.query(PassengerRide, Ride, User.full_name, User.average_rating).join(
+        Ride, PassengerRide.ride_id == Ride.id
+    ).join(
+        User, Ride.driver_id == User.id
+    ).filter(PassengerRide.passenger_id == int(passenger_id))
+
+    if statuses:
+        query = query.filter(PassengerRide.status.in_(statuses))
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if when == 'upcoming':
+        query = query.filter(Ride.departure_time > now)
+    elif when == 'past':
+        query = query.filter(Ride.departure_time <= now)
+
+    # Upcoming trips read soonest first; history reads most recent first
+    descending = when != 'upcoming'
+
+    # Keyset pagination on (departure_time, booking id)
+    if cursor:
+        try:
+            query = query.filter(after_cursor(Ride.departure_time, PassengerRide.id, cursor, descending=descending))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+    if descending:
+        query = query.order_by(Ride.departure_time.desc(), PassengerRide.id.desc())
+    else:
+        query = query.order_by(Ride.departure_time.asc(), PassengerRide.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
     booking_list = []
-    for booking in bookings:
-        ride = Ride.query.get(booking.ride_id)
-        driver = User.query.get(ride.driver_id)
-        
+    for booking, ride, driver_name, driver_rating in rows:
         booking_list.append({
             'booking_id': booking.id,
             'ride_id': ride.id,
@@ -397,9 +801,14 @@ def get_user_bookings():
                 'origin': ride.origin,
                 'destination': ride.destination,
                 'departure_time': ride.departure_time.isoformat(),
-                'driver_name': driver.full_name,
-                'driver_rating': driver.average_rating,
+                'driver_name': driver_name,
+                'driver_rating': driver_rating,
             }
         })
-        
-    return jsonify(booking_list), 200
\ No newline at end of file
+
+    next_cursor = None
+    if has_more:
+        last_booking, last_ride = rows[-1][0], rows[-1][1]
+        next_cursor = encode_cursor(last_ride.departure_time, last_booking.id)
+
+    return jsonify({"bookings": booking_list, "next_cursor": next_cursor}), 200
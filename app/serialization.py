@@ -0,0 +1,118 @@
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from app import db
+from app.models import Ride, Vehicle, ChatMessage
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed and
+    falls back to the stdlib encoder otherwise. Output matches the default
+    provider: sorted keys, datetimes as HTTP dates via `default`, indented
+    only in debug mode (which always uses the stdlib path).
+    """
+
+    def _orjson_options(self):
+        # Datetimes go through `default` so they render exactly as before;
+        # int keys (e.g. the rating histogram) are stringified like json.dumps does
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class RowSerializer:
+    """
+    Turns plain column rows into response dicts without loading ORM objects.
+
+    Built from keyword arguments mapping output keys to column expressions;
+    `columns` is what to select, dump()/dump_all() build the dicts. DateTime
+    columns are rendered with isoformat(), as the models' to_dict() do.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.keys = tuple(fields)
+        self.columns = tuple(column.label(key) for key, column in fields.items())
+        self._datetime_keys = frozenset(
+            key for key, column in fields.items() if isinstance(column.type, db.DateTime)
+        )
+
+    def extend(self, **fields):
+        """A new serializer with extra fields appended (e.g. joined columns)."""
+        return RowSerializer(**self.fields, **fields)
+
+    def query(self):
+        return db.session.query(*self.columns)
+
+    def dump(self, row):
+        data = dict(zip(self.keys, row))
+        for key in self._datetime_keys:
+            value = data[key]
+            if isinstance(value, datetime):
+                data[key] = value.isoformat()
+        return data
+
+    def dump_all(self, rows):
+        return [self.dump(row) for row in rows]
+
+
+# Same keys as the corresponding to_dict() methods
+
+ride_row = RowSerializer(
+    id=Ride.id,
+    driver_id=Ride.driver_id,
+    vehicle_id=Ride.vehicle_id,
+    origin=Ride.origin,
+    destination=Ride.destination,
+    origin_lat=Ride.origin_lat,
+    origin_lng=Ride.origin_lng,
+    destination_lat=Ride.destination_lat,
+    destination_lng=Ride.destination_lng,
+    waypoints_polyline=Ride.waypoints_polyline,
+    departure_time=Ride.departure_time,
+    available_seats=Ride.available_seats,
+    status=Ride.status
+)
+
+vehicle_row = RowSerializer(
+    id=Vehicle.id,
+    license_plate=Vehicle.license_plate,
+    make=Vehicle.make,
+    model=Vehicle.model,
+    year=Vehicle.year,
+    color=Vehicle.color,
+    seat_capacity=Vehicle.seat_capacity,
+    is_verified=Vehicle.is_verified
+)
+
+chat_message_row = RowSerializer(
+    id=ChatMessage.id,
+    uid=ChatMessage.uid,
+    ride_id=ChatMessage.ride_id,
+    sender_id=ChatMessage.sender_id,
+    content=ChatMessage.content,
+    timestamp=ChatMessage.timestamp
+)
@@ -0,0 +1,94 @@
+import heapq
+import threading
+import time
+from collections import namedtuple
+from flask import request, current_app
+from flask_socketio import join_room
+from app import socketio
+from app.user_cache import user_cache
+from app.tokens import is_token_current
+import jwt as pyjwt
+
+# How often expired connections are swept (seconds)
+EXPIRY_SWEEP_INTERVAL = 5
+
+SocketIdentity = namedtuple('SocketIdentity', ['user_id', 'role', 'full_name', 'expires_at'])
+
+# sid -> SocketIdentity, filled once at connect so events never decode tokens
+sessions = {}
+_expiries = []  # heap of (expires_at, sid)
+_lock = threading.Lock()
+_sweeper_started = False
+
+
+def authenticate(token):
+    """Decodes the JWT and loads the caller's role. Returns a SocketIdentity or None."""
+    if not token:
+        return None
+    try:
+        secret = current_app.config.get('JWT_SECRET_KEY')
+        payload = pyjwt.decode(token, secret, algorithms=["HS256"])
+    except pyjwt.PyJWTError:
+        return None
+
+    user = user_cache.get(payload.get('sub') or payload.get('identity'))
+    if not user or not is_token_current(payload):
+        return None
+    return SocketIdentity(user_id=str(user.id), role=user.role, full_name=user.full_name,
+                          expires_at=payload.get('exp'))
+
+
+def current_identity():
+    """Identity of the connection that sent the current event, or None once its token has expired."""
+    identity = sessions.get(request.sid)
+    if identity and identity.expires_at and identity.expires_at <= time.time():
+        return None
+    return identity
+
+
+def _sweep_expired():
+    """Disconnects sockets whose token has expired."""
+    while True:
+        socketio.sleep(EXPIRY_SWEEP_INTERVAL)
+        now = time.time()
+        expired = []
+        with _lock:
+            while _expiries and _expiries[0][0] <= now:
+                _, sid = heapq.heappop(_expiries)
+                identity = sessions.get(sid)
+                if identity and identity.expires_at and identity.expires_at <= now:
+                    del sessions[sid]
+                    expired.append(sid)
+
+        for sid in expired:
+            socketio.server.disconnect(sid, namespace='/')
+
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    # Token from the Socket.IO auth payload, or ?token= for older clients
+    token = auth.get('token') if isinstance(auth, dict) else None
+    identity = authenticate(token or request.args.get('token'))
+    if not identity:
+        return False  # refuse the handshake
+
+    global _sweeper_started
+    with _lock:
+        sessions[request.sid] = identity
+        if identity.expires_at:
+            heapq.heappush(_expiries, (identity.expires_at, request.sid))
+        start_sweeper = not _sweeper_started
+        _sweeper_started = True
+
+    if start_sweeper:
+        socketio.start_background_task(_sweep_expired)
+
+    # Every user joins their own private room: "user_5"
+    # This allows us to send direct messages to them
+    join_room(f"user_{identity.user_id}")
+
+
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    with _lock:
+        sessions.pop(request.sid, None)
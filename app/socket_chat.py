@@ -1,26 +1,19 @@
 from flask_socketio import emit, join_room
-from flask import request
-from app import socketio, db
-from app.models import User, ChatMessage
-import jwt as pyjwt
-from flask import current_app
+from app import socketio
+from app.chat_pipeline import chat_pipeline, ChatUnavailable
+from app.socket_auth import current_identity
 
-def get_user_id(token):
-    try:
-        secret = current_app.config.get('JWT_SECRET_KEY')
-        payload = pyjwt.decode(token, secret, algorithms=["HS256"])
-        return payload.get('sub') or payload.get('identity')
-    except:
-        return None
-
-@socketio.on('connect')
-def handle_connect():
-    token = request.args.get('token')
-    user_id = get_user_id(token)
-    if user_id:
-        # Every user joins their own private room: "user_5"
-        # This allows us to send direct messages to them
-        join_room(f"user_{user_id}")
+def message_payload(row, sender_name):
+    """Event payload for a queued message; 'id' is assigned once it is persisted, 'uid' is stable."""
+    return {
+        'id': None,
+        'uid': row['uid'],
+        'ride_id': row['ride_id'],
+        'sender_id': row['sender_id'],
+        'sender_name': sender_name,
+        'content': row['content'],
+        'timestamp': row['timestamp'].isoformat()
+    }
 
 @socketio.on('join_ride_chat')
 def on_join_ride(data):
@@ -33,29 +26,30 @@ def handle_direct_message(data):
     """
     Sends a message to a specific person (e.g., Passenger to Driver).
     """
-    token = request.args.get('token')
-    sender_id = get_user_id(token)
-    if not sender_id: return
+    identity = current_identity()
+    if not identity: return
+    sender_id = identity.user_id
 
     receiver_id = data.get('receiver_id')
     ride_id = data.get('ride_id')
     content = data.get('content')
 
-    if not all([receiver_id, content]): return
+    # ride_id is required: every stored message belongs to a ride
+    if not all([receiver_id, ride_id, content]): return
 
-    # Save to DB
-    msg = ChatMessage(
-        ride_id=ride_id,
-        sender_id=sender_id,
-        receiver_id=receiver_id, # You'll need to add this column to ChatMessage model
-        content=content
-    )
-    db.session.add(msg)
-    db.session.commit()
+    try:
+        # Queue for persistence; the write happens behind the emit
+        row = chat_pipeline.submit(ride_id, sender_id, content, receiver_id=receiver_id)
+    except (TypeError, ValueError):
+        return
+    except ChatUnavailable as e:
+        emit('chat_error', {'msg': str(e), 'ride_id': ride_id, 'receiver_id': receiver_id})
+        return
 
     # BROADCAST specifically to the receiver's private room
     # And to the sender's room (so it shows up on their other devices)
-    payload = msg.to_dict()
+    payload = message_payload(row, identity.full_name)
+    payload['receiver_id'] = row['receiver_id']
     emit('new_private_message', payload, room=f"user_{receiver_id}")
     emit('new_private_message', payload, room=f"user_{sender_id}")
 
@@ -64,15 +58,22 @@ def handle_ride_message(data):
     """
     Existing group chat logic for everyone in the ride.
     """
-    token = request.args.get('token')
-    sender_id = get_user_id(token)
-    if not sender_id: return
+    identity = current_identity()
+    if not identity: return
+    sender_id = identity.user_id
     
     ride_id = data.get('ride_id')
     content = data.get('content')
     
-    msg = ChatMessage(ride_id=ride_id, sender_id=sender_id, content=content)
-    db.session.add(msg)
-    db.session.commit()
+    if not all([ride_id, content]): return
+
+    try:
+        # Queue for persistence; the write happens behind the emit
+        row = chat_pipeline.submit(ride_id, sender_id, content)
+    except (TypeError, ValueError):
+        return
+    except ChatUnavailable as e:
+        emit('chat_error', {'msg': str(e), 'ride_id': ride_id})
+        return
     
-    emit('new_ride_message', msg.to_dict(), room=f"ride_{ride_id}")
\ No newline at end of file
+    emit('new_ride_message', message_payload(row, identity.full_name), room=f"ride_{ride_id}")
\ No newline at end of file
@@ -0,0 +1,31 @@
+from socketio import RedisManager, KafkaManager, ZmqManager, KombuManager
+from app.metrics import MeteredManager
+
+
+def create_client_manager(app):
+    """
+    The Socket.IO client manager for SOCKETIO_MESSAGE_QUEUE.
+
+    Without a queue, rooms live in this process only. With one, every emit
+    is relayed through the queue to all workers sharing SOCKETIO_CHANNEL, so
+    user_*, ride_* and tracking_* rooms span workers. URLs are the ones
+    Flask-SocketIO accepts: redis://, rediss://, kafka://, zmq://, and Kombu
+    (amqp:// and the like) for anything else. Either way the manager records
+    emit fan-out for /metrics.
+    """
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    if not url:
+        return MeteredManager()
+
+    if url.startswith(('redis://', 'rediss://')):
+        queue_class = RedisManager
+    elif url.startswith('kafka://'):
+        queue_class = KafkaManager
+    elif url.startswith('zmq'):
+        queue_class = ZmqManager
+    else:
+        queue_class = KombuManager
+
+    # Local deliveries (from this worker or relayed from others) reach MeteredManager.emit
+    manager_class = type(f'Metered{queue_class.__name__}', (queue_class, MeteredManager), {})
+    return manager_class(url, channel=app.config.get('SOCKETIO_CHANNEL', 'rwaride-socketio'))
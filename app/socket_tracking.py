@@ -1,18 +1,166 @@
 from flask_socketio import emit, join_room, leave_room
-from flask import request
-from app import socketio, db
-from app.models import DriverLocation, User
-import jwt as pyjwt
-from flask import current_app
-
-def get_user_id(token):
-    """Helper to decode JWT and get user ID."""
-    try:
-        secret = current_app.config.get('JWT_SECRET_KEY')
-        payload = pyjwt.decode(token, secret, algorithms=["HS256"])
-        return payload.get('sub') or payload.get('identity')
-    except:
-        return None
+from app import socketio
+from app.location_hub import location_hub
+from app.geo import haversine_km
+from app.socket_auth import current_identity
+import threading
+import time
+
+# Delta payloads carry coordinates as integer steps of 1e-5 degrees (~1.1 m)
+DELTA_SCALE = 100000
+# Forget drivers that have been silent this long (seconds)
+COALESCER_IDLE_TIMEOUT = 600
+
+
+class LocationCoalescer:
+    """
+    Decides which driver pings are worth re-broadcasting to a tracking room.
+
+    Pings that moved less than LOCATION_MIN_MOVE_METERS are dropped unless
+    LOCATION_MAX_SILENCE seconds have passed since the last broadcast. A driver
+    is never broadcast more than once per LOCATION_MIN_BROADCAST_INTERVAL; a ping
+    arriving inside that window is held and sent when the window closes, so
+    the room always ends on the driver's latest position.
+
+    With LOCATION_DELTA_ENCODING on, positions are quantized and only every
+    LOCATION_KEYFRAME_EVERY-th broadcast is a full 'location_received'; the
+    rest are 'location_delta' events carrying integer offsets (dlat, dlng in
+    1e-5 degree steps) from the previous broadcast.
+    """
+
+    def __init__(self):
+        self._states = {}  # (str(driver_id), str(ride_id)) -> state dict
+        self._lock = threading.Lock()
+        self._flusher_started = False
+        self.config = {}
+
+        self.pings_received = 0
+        self.pings_dropped = 0
+        self.pings_deferred = 0
+        self.broadcasts = 0
+        self.delta_broadcasts = 0
+
+    def init_app(self, app):
+        self.config = {
+            'min_move_m': app.config.get('LOCATION_MIN_MOVE_METERS', 5.0),
+            'min_interval': app.config.get('LOCATION_MIN_BROADCAST_INTERVAL', 1.0),
+            'max_silence': app.config.get('LOCATION_MAX_SILENCE', 15.0),
+            'delta_encoding': app.config.get('LOCATION_DELTA_ENCODING', False),
+            'keyframe_every': app.config.get('LOCATION_KEYFRAME_EVERY', 10),
+        }
+        if self.config['keyframe_every'] < 1:
+            raise ValueError("LOCATION_KEYFRAME_EVERY must be at least 1 (1 sends every broadcast in full)")
+
+    def submit(self, driver_id, ride_id, lat, lng):
+        """Feeds one ping through the coalescer, broadcasting it if due."""
+        now = time.monotonic()
+        key = (str(driver_id), str(ride_id))
+        with self._lock:
+            self.pings_received += 1
+            state = self._states.get(key)
+            if state is None:
+                state = {'driver_id': driver_id, 'ride_id': ride_id, 'seq': 0,
+                         'sent': None, 'sent_at': 0.0, 'pending': None, 'seen_at': now}
+                self._states[key] = state
+            state['seen_at'] = now
+
+            if state['sent'] is not None:
+                moved_m = haversine_km(state['sent'][0], state['sent'][1], lat, lng) * 1000
+                since_sent = now - state['sent_at']
+
+                if moved_m < self.config['min_move_m'] and since_sent < self.config['max_silence']:
+                    # Still where the room last saw them; any held ping is obsolete too
+                    state['pending'] = None
+                    self.pings_dropped += 1
+                    return
+
+                if since_sent < self.config['min_interval']:
+                    state['pending'] = (lat, lng)
+                    self.pings_deferred += 1
+                    self._ensure_flusher()
+                    return
+
+            event, payload = self._next_broadcast(state, lat, lng, now)
+
+        socketio.emit(event, payload, to=f"tracking_{ride_id}")
+
+    def latest_for_ride(self, ride_id):
+        """Full 'location_received' payloads of the last broadcast of each driver on the ride."""
+        with self._lock:
+            return [self._full_payload(state, *state['sent'])
+                    for (_, state_ride_id), state in self._states.items()
+                    if state_ride_id == str(ride_id) and state['sent'] is not None]
+
+    def _next_broadcast(self, state, lat, lng, now):
+        """Builds the next event for a driver and records it as sent. Caller holds the lock."""
+        previous = state['sent']
+        state['seq'] += 1
+        state['sent_at'] = now
+        state['pending'] = None
+        self.broadcasts += 1
+
+        if not self.config['delta_encoding']:
+            state['sent'] = (lat, lng)
+            return 'location_received', self._full_payload(state, lat, lng)
+
+        q_lat, q_lng = round(lat * DELTA_SCALE), round(lng * DELTA_SCALE)
+        state['sent'] = (q_lat / DELTA_SCALE, q_lng / DELTA_SCALE)
+        if previous is None or (state['seq'] - 1) % self.config['keyframe_every'] == 0:
+            return 'location_received', self._full_payload(state, *state['sent'])
+
+        self.delta_broadcasts += 1
+        return 'location_delta', {
+            "driver_id": state['driver_id'],
+            "ride_id": state['ride_id'],
+            "seq": state['seq'],
+            "dlat": q_lat - round(previous[0] * DELTA_SCALE),
+            "dlng": q_lng - round(previous[1] * DELTA_SCALE)
+        }
+
+    @staticmethod
+    def _full_payload(state, lat, lng):
+        return {
+            "driver_id": state['driver_id'],
+            "lat": lat,
+            "lng": lng,
+            "ride_id": state['ride_id'],
+            "seq": state['seq']
+        }
+
+    def _ensure_flusher(self):
+        if not self._flusher_started:
+            self._flusher_started = True
+            socketio.start_background_task(self._flush_pending_loop)
+
+    def _flush_pending_loop(self):
+        """Sends held pings once their driver's rate-limit window has closed."""
+        while True:
+            socketio.sleep(max(self.config['min_interval'] / 2, 0.05))
+            now = time.monotonic()
+            due = []
+            with self._lock:
+                for key, state in list(self._states.items()):
+                    if state['pending'] and now - state['sent_at'] >= self.config['min_interval']:
+                        due.append((state['ride_id'], self._next_broadcast(state, *state['pending'], now)))
+                    elif now - state['seen_at'] > COALESCER_IDLE_TIMEOUT:
+                        del self._states[key]
+
+            for ride_id, (event, payload) in due:
+                socketio.emit(event, payload, to=f"tracking_{ride_id}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_streams': len(self._states),
+                'pings_received': self.pings_received,
+                'pings_dropped': self.pings_dropped,
+                'pings_deferred': self.pings_deferred,
+                'broadcasts': self.broadcasts,
+                'delta_broadcasts': self.delta_broadcasts
+            }
+
+
+coalescer = LocationCoalescer()
 
 @socketio.on('join_tracking')
 def on_join_tracking(data):
@@ -21,22 +169,20 @@ def on_join_tracking(data):
     if ride_id:
         join_room(f"tracking_{ride_id}")
 
+        # Late joiners get the current position (and a keyframe for delta decoding) right away
+        for payload in coalescer.latest_for_ride(ride_id):
+            emit('location_received', payload)
+
 @socketio.on('update_location')
 def handle_location(data):
     """
-    Driver calls this to update their GPS. Auth is done via query parameter token.
+    Driver calls this to update their GPS. The connection was authenticated at
+    connect time, so this hot path does no token decoding and no DB lookups.
     """
-    # FIX: Get token from the query string passed in the curl request
-    token = request.args.get('token')
-    user_id = get_user_id(token)
-    
-    if not user_id: 
-        # Token is invalid or missing, reject the event
-        return 
-
-    user = User.query.get(user_id)
-    if not user or user.role not in ['driver', 'both']:
-        return # Only drivers can send location
+    identity = current_identity()
+    if not identity or identity.role not in ['driver', 'both']:
+        return # Only authenticated drivers can send location
+    user_id = identity.user_id
 
     ride_id = data.get('ride_id')
     lat = data.get('lat')
@@ -44,22 +190,13 @@ def handle_location(data):
     
     if not all([ride_id, lat, lng]): return
 
-    # 1. Persistent Storage (Update or Create)
-    loc = DriverLocation.query.filter_by(driver_id=user_id).first()
-    if not loc:
-        loc = DriverLocation(driver_id=user_id, latitude=lat, longitude=lng)
-        db.session.add(loc)
-    else:
-        loc.latitude = lat
-        loc.longitude = lng
-    
-    db.session.commit()
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return
+
+    # 1. Record in memory; the location hub writes it behind to DriverLocation
+    location_hub.update(user_id, lat, lng)
     
-    # 2. BROADCAST to passengers in the room
-    broadcast_data = {
-        "driver_id": user_id,
-        "lat": lat,
-        "lng": lng,
-        "ride_id": ride_id
-    }
-    emit('location_received', broadcast_data, room=f"tracking_{ride_id}")
\ No newline at end of file
+    # 2. BROADCAST to passengers in the room, minus pings that add nothing
+    coalescer.submit(user_id, ride_id, lat, lng)
\ No newline at end of file
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import event, func, inspect, update
+from app import db
+from app.background import PeriodicFlusher
+from app.models import User, Ride, PassengerRide, Vehicle, StatCounter
+
+# model -> (attribute, function mapping the attribute's value to a counter name or None)
+TRACKED_ATTRIBUTES = {
+    User: ('role', lambda role: f'users.role.{role}'),
+    Ride: ('status', lambda status: f'rides.status.{status}'),
+    PassengerRide: ('status', lambda status: f'bookings.status.{status}'),
+    Vehicle: ('is_verified', lambda verified: 'vehicles.pending' if verified is False else None),
+}
+
+# Counters created up front so the first increment of each always has a row to land on
+KNOWN_COUNTERS = (
+    [f'users.role.{role}' for role in ('passenger', 'driver', 'both', 'admin')] +
+    [f'rides.status.{status}' for status in ('open', 'full', 'completed', 'cancelled')] +
+    [f'bookings.status.{status}' for status in ('pending', 'confirmed', 'canceled', 'completed')] +
+    ['vehicles.pending']
+)
+
+_SESSION_KEY = 'stat_deltas'
+
+
+def record_change(session, name, delta):
+    """
+    Adds a counter delta to the current transaction. Needed only for writes that
+    bypass the ORM unit of work (Core UPDATE/DELETE statements); ORM inserts,
+    updates and deletes of tracked models are picked up automatically.
+    """
+    session.info.setdefault(_SESSION_KEY, Counter())[name] += delta
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_deltas(session, flush_context):
+    for obj in session.new:
+        _count(session, obj, +1)
+    for obj in session.deleted:
+        _count(session, obj, -1)
+    for obj in session.dirty:
+        tracked = TRACKED_ATTRIBUTES.get(type(obj))
+        if not tracked:
+            continue
+        attribute, counter_for = tracked
+        history = inspect(obj).attrs[attribute].history
+        if history.added and history.deleted:
+            _record(session, counter_for(history.deleted[0]), -1)
+            _record(session, counter_for(history.added[0]), +1)
+
+
+def _count(session, obj, delta):
+    tracked = TRACKED_ATTRIBUTES.get(type(obj))
+    if tracked:
+        attribute, counter_for = tracked
+        value = inspect(obj).dict.get(attribute)
+        if value is not None:
+            _record(session, counter_for(value), delta)
+
+
+def _record(session, name, delta):
+    if name:
+        record_change(session, name, delta)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_deltas(session):
+    deltas = session.info.pop(_SESSION_KEY, None)
+    if deltas:
+        stats_cache.add_pending(deltas)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_deltas(session, transaction):
+    # Anything still here when the outermost transaction ends was rolled back
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
+
+
+class StatsCache:
+    """
+    Admin dashboard counters.
+
+    Committed deltas are buffered in memory and applied to the stat_counter
+    table in one transaction every STATS_FLUSH_INTERVAL seconds, keeping
+    counter rows out of request transactions. Each worker adds its own deltas,
+    so the table stays correct with several processes. reconcile() recomputes
+    every counter from the source tables; it runs every
+    STATS_RECONCILE_INTERVAL seconds and via 'flask stats reconcile'.
+    Reads are served from a snapshot that is at most STATS_CACHE_TTL seconds old.
+    """
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self.ttl = 10.0
+        self._flusher = PeriodicFlusher('stats-flush', self.flush, interval=5.0)
+        self._reconciler = PeriodicFlusher('stats-reconcile', self.reconcile, interval=3600.0, flush_at_exit=False)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('STATS_CACHE_TTL', 10.0)
+        self._flusher.init_app(app, app.config.get('STATS_FLUSH_INTERVAL', 5.0))
+        self._reconciler.init_app(app, app.config.get('STATS_RECONCILE_INTERVAL', 3600.0))
+
+    def add_pending(self, deltas):
+        with self._lock:
+            self._pending.update(deltas)
+        self._flusher.start()
+
+    def flush(self):
+        """Applies buffered deltas to stat_counter. Needs an app context."""
+        with self._lock:
+            deltas, self._pending = self._pending, Counter()
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        now = datetime.now(timezone.utc)
+        try:
+            for name, delta in deltas.items():
+                result = db.session.execute(
+                    update(StatCounter).where(StatCounter.name == name).values(
+                        value=StatCounter.value + delta, updated_at=now
+                    )
+                )
+                if result.rowcount == 0:
+                    # Not seen before; the next reconcile corrects any race on this insert
+                    db.session.add(StatCounter(name=name, value=delta, updated_at=now))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._pending.update(deltas)
+            raise
+
+    def reconcile(self):
+        """Recomputes every counter from the source tables. Needs an app context."""
+        self.flush()
+        actual = Counter({name: 0 for name in KNOWN_COUNTERS})
+        for role, count in db.session.query(User.role, func.count(User.id)).group_by(User.role):
+            actual[f'users.role.{role}'] = count
+        for status, count in db.session.query(Ride.status, func.count(Ride.id)).group_by(Ride.status):
+            actual[f'rides.status.{status}'] = count
+        for status, count in db.session.query(PassengerRide.status, func.count(PassengerRide.id)).group_by(PassengerRide.status):
+            actual[f'bookings.status.{status}'] = count
+        actual['vehicles.pending'] = Vehicle.query.filter_by(is_verified=False).count()
+
+        now = datetime.now(timezone.utc)
+        existing = {counter.name: counter for counter in StatCounter.query}
+        for name, value in actual.items():
+            counter = existing.pop(name, None) or StatCounter(name=name)
+            counter.value = value
+            counter.updated_at = now
+            counter.reconciled_at = now
+            db.session.add(counter)
+        # Counters whose category no longer exists at all
+        for counter in existing.values():
+            counter.value = 0
+            counter.reconciled_at = now
+        db.session.commit()
+        self._snapshot = None
+
+    def snapshot(self):
+        """Grouped counters plus freshness timestamps, cached for STATS_CACHE_TTL seconds."""
+        if self._snapshot and time.monotonic() - self._snapshot_at < self.ttl:
+            return self._snapshot
+
+        counters = StatCounter.query.all()
+        if not counters:
+            self.reconcile()
+            counters = StatCounter.query.all()
+        self._reconciler.start()
+
+        groups = {'users_by_role': {}, 'rides_by_status': {}, 'bookings_by_status': {}}
+        prefixes = {'users.role.': 'users_by_role', 'rides.status.': 'rides_by_status',
+                    'bookings.status.': 'bookings_by_status'}
+        pending_vehicles = 0
+        for counter in counters:
+            if counter.name == 'vehicles.pending':
+                pending_vehicles = counter.value
+            for prefix, group in prefixes.items():
+                if counter.name.startswith(prefix):
+                    groups[group][counter.name[len(prefix):]] = counter.value
+
+        updated = [c.updated_at for c in counters if c.updated_at]
+        reconciled = [c.reconciled_at for c in counters if c.reconciled_at]
+        self._snapshot = {
+            "total_users": sum(groups['users_by_role'].values()),
+            "total_rides": sum(groups['rides_by_status'].values()),
+            "pending_vehicles": pending_vehicles,
+            **groups,
+            "updated_at": max(updated).isoformat() if updated else None,
+            "reconciled_at": min(reconciled).isoformat() if reconciled else None
+        }
+        self._snapshot_at = time.monotonic()
+        return self._snapshot
+
+
+stats_cache = StatsCache()
@@ -0,0 +1,35 @@
+from app import jwt
+from app.user_cache import user_cache
+
+# Bumped (via revoke_tokens) whenever a change must invalidate already issued tokens
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def access_claims(user):
+    """Authorization claims embedded in access tokens so decorators needn't load the user."""
+    return {
+        'role': user.role,
+        'identity_verified': bool(user.is_identity_verified),
+        'license_verified': bool(user.is_license_verified),
+        TOKEN_VERSION_CLAIM: user.token_version or 0
+    }
+
+
+def revoke_tokens(user):
+    """Invalidates every token issued to the user so far. Commit to take effect."""
+    user.token_version = (user.token_version or 0) + 1
+
+
+def is_token_current(payload):
+    """True if the token's user still exists and the token predates no revocation."""
+    version = user_cache.token_version(payload.get('sub'))
+    if version is None:
+        return False
+    return payload.get(TOKEN_VERSION_CLAIM, 0) == version
+
+
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    # Served from the user cache when that is shared by all workers, so accepting a
+    # token then costs no query; otherwise one primary-key lookup of token_version
+    return not is_token_current(jwt_payload)
@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify
 from app.models import DriverLocation
+from app.location_hub import location_hub
+from app.conditional import make_etag, not_modified, tag
 from flask_jwt_extended import jwt_required
 
 tracking_bp = Blueprint('tracking', __name__)
@@ -10,9 +12,18 @@ def get_driver_location(driver_id):
     """
     Fetches the last known location of a driver.
     Useful for initializing the map view before live updates begin.
+    Polls with If-None-Match get a 304 until the driver's position timestamp moves.
     """
+    # Live positions are served from memory; the table covers drivers this process hasn't
+    # seen lately (with several workers they may be pinging another one)
+    live_location = location_hub.get(driver_id)
+    if live_location:
+        etag = make_etag(live_location['updated_at'])
+        return not_modified(etag) or (tag(jsonify(live_location), etag), 200)
+
     location = DriverLocation.query.filter_by(driver_id=driver_id).first()
     if not location:
         return jsonify({"msg": "No location data available for this driver."}), 404
-        
-    return jsonify(location.to_dict()), 200
\ No newline at end of file
+
+    etag = make_etag(location.updated_at.isoformat())
+    return not_modified(etag) or (tag(jsonify(location.to_dict()), etag), 200)
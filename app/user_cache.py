@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from sqlalchemy import event
+from app import db
+from app.models import User
+
+try:
+    import redis
+except ImportError:  # optional; only needed for USER_CACHE_BACKEND=redis
+    redis = None
+
+# Read-only snapshot of the fields request handlers need about a user
+CachedUser = namedtuple('CachedUser', [
+    'id', 'full_name', 'email', 'phone_number', 'role', 'bio', 'created_at',
+    'average_rating', 'rating_count', 'rating_histogram', 'total_ride_count',
+    'is_identity_verified', 'driver_license_id', 'is_license_verified', 'token_version'
+])
+
+_SESSION_KEY = 'stale_user_ids'
+
+
+def invalidate_user(session, user_id):
+    """
+    Drops a user's cached profile once the current transaction commits. Needed
+    only for writes that bypass the ORM unit of work (Core UPDATE statements);
+    ORM updates and deletes of User rows are picked up automatically.
+    """
+    session.info.setdefault(_SESSION_KEY, set()).add(int(user_id))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_stale_users(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            invalidate_user(session, obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_stale_users(session):
+    for user_id in session.info.pop(_SESSION_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_stale_users(session, transaction):
+    # Nothing changed if the outermost transaction rolled back
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
+
+
+class MemoryBackend:
+    """Per-process LRU with a TTL on every entry."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, profile):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared cache in a Redis-compatible server, so an invalidation in one worker
+    is seen by all of them. Entries expire after the TTL; size is bounded by
+    the server's maxmemory policy (use allkeys-lru).
+    """
+
+    prefix = 'user_profile:'
+
+    def __init__(self, url, ttl):
+        if redis is None:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requires the 'redis' package")
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, user_id):
+        raw = self._client.get(f'{self.prefix}{user_id}')
+        if not raw:
+            return None
+        # JSON, not pickle: whoever can write to the server must not be able to run code here
+        data = json.loads(raw)
+        if data['created_at']:
+            data['created_at'] = datetime.fromisoformat(data['created_at'])
+        data['rating_histogram'] = {int(stars): count for stars, count in data['rating_histogram'].items()}
+        return CachedUser(**data)
+
+    def set(self, user_id, profile):
+        data = profile._asdict()
+        if data['created_at']:
+            data['created_at'] = data['created_at'].isoformat()
+        self._client.setex(f'{self.prefix}{user_id}', max(1, int(self.ttl)), json.dumps(data))
+
+    def delete(self, user_id):
+        self._client.delete(f'{self.prefix}{user_id}')
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=f'{self.prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self):
+        return None
+
+
+class UserCache:
+    """
+    Read-through cache of user profiles for the per-request "who is calling"
+    lookups. get() returns a read-only CachedUser; handlers that modify the
+    user must load the ORM object instead. Committed changes to a user evict
+    their entry, and every entry expires after USER_CACHE_TTL seconds, which
+    bounds staleness across workers with the in-process backend. Lookups that
+    must not be stale at all (token revocation) use token_version().
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend(max_size=10000, ttl=60.0)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Whether every worker sees an eviction as soon as it happens
+        self.coherent = True
+
+    def init_app(self, app):
+        ttl = app.config.get('USER_CACHE_TTL', 60.0)
+        if app.config.get('USER_CACHE_BACKEND', 'memory') == 'redis':
+            self.backend = RedisBackend(app.config.get('USER_CACHE_URL', 'redis://localhost:6379/0'), ttl)
+            self.coherent = True
+        else:
+            self.backend = MemoryBackend(app.config.get('USER_CACHE_SIZE', 10000), ttl)
+            # Evictions only reach this process; other workers keep their copy until the TTL
+            self.coherent = app.config.get('WEB_CONCURRENCY', 1) <= 1
+
+    def get(self, user_id):
+        """The user's cached profile, loaded from the database on a miss. None if the user doesn't exist."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        profile = self.backend.get(user_id)
+        with self._lock:
+            if profile is not None:
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        profile = CachedUser(
+            id=user.id,
+            full_name=user.full_name,
+            email=user.email,
+            phone_number=user.phone_number,
+            role=user.role,
+            bio=user.bio,
+            created_at=user.created_at,
+            average_rating=user.average_rating,
+            rating_count=user.rating_count,
+            rating_histogram=user.rating_histogram(),
+            total_ride_count=user.total_ride_count,
+            is_identity_verified=user.is_identity_verified,
+            driver_license_id=user.driver_license_id,
+            is_license_verified=user.is_license_verified,
+            token_version=user.token_version
+        )
+        self.backend.set(user_id, profile)
+        return profile
+
+    def token_version(self, user_id):
+        """
+        The user's current token_version, or None if the user doesn't exist.
+        Served from the cache only when it is coherent across workers; with
+        per-process caches in several workers it is read from the database,
+        so a revocation takes effect everywhere as soon as it commits.
+        """
+        if self.coherent:
+            user = self.get(user_id)
+            return None if user is None else user.token_version or 0
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        row = db.session.query(User.token_version).filter(User.id == user_id).first()
+        return None if row is None else row.token_version or 0
+
+    def invalidate(self, user_id):
+        self.backend.delete(int(user_id))
+        with self._lock:
+            self.invalidations += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'coherent': self.coherent,
+                'entries': self.backend.size(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations
+            }
+
+
+user_cache = UserCache()
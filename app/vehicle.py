@@ -1,23 +1,18 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import User, Vehicle
+from app.models import Vehicle
+from app.decorators import role_required
+from app.serialization import vehicle_row
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 vehicle_bp = Blueprint('vehicle', __name__)
 
-def is_driver(user):
-    """Checks if the user has a 'driver' or 'both' role."""
-    return user.role in ['driver', 'both']
-
 # Register a new vehicle
 @vehicle_bp.route('/', methods=['POST'])
 @jwt_required()
+@role_required('driver', 'both', msg="Unauthorized: Only drivers can register vehicles")
 def register_vehicle():
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id)) # Cast to INT for primary lookup
-
-    if not user or not is_driver(user):
-        return jsonify({"msg": "Unauthorized: Only drivers can register vehicles"}), 403
+    user_id = int(get_jwt_identity())
 
     data = request.get_json()
     license_plate = data.get('license_plate')
@@ -31,7 +26,7 @@ def register_vehicle():
 
     try:
         new_vehicle = Vehicle(
-            owner_id=user.id,
+            owner_id=user_id,
             license_plate=license_plate,
             seat_capacity=seat_capacity,
             make=data.get('make'),
@@ -55,28 +50,13 @@ def register_vehicle():
 # Get all vehicles owned by the current user
 @vehicle_bp.route('/', methods=['GET'])
 @jwt_required()
+@role_required('driver', 'both', msg="Unauthorized: Access restricted to drivers")
 def get_user_vehicles():
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
-    
-    if not user or not is_driver(user):
-        return jsonify({"msg": "Unauthorized: Access restricted to drivers"}), 403
+    user_id = int(get_jwt_identity())
+
+    rows = vehicle_row.query().filter(Vehicle.owner_id == user_id).all()
+    vehicle_list = vehicle_row.dump_all(rows)
 
-    vehicles = user.vehicles.all() 
-    
-    vehicle_list = []
-    for vehicle in vehicles:
-        vehicle_list.append({
-            "id": vehicle.id,
-            "license_plate": vehicle.license_plate,
-            "make": vehicle.make,
-            "model": vehicle.model,
-            "year": vehicle.year,
-            "color": vehicle.color,
-            "seat_capacity": vehicle.seat_capacity,
-            "is_verified": vehicle.is_verified
-        })
-        
     return jsonify(vehicle_list), 200
 
 # Update a specific vehicle
@@ -0,0 +1,133 @@
+"""
+Booking contention benchmark.
+
+Fires many simultaneous bookings at a single ride through the real
+create_booking route and checks that seats are never oversold and that
+every request gets 201 or a clean 400/409 (exit code 1 otherwise).
+
+    python benchmarks/booking_contention.py --passengers 300 --seats 50 --workers 64
+
+The database comes from BENCH_DATABASE_URL (default: a throwaway SQLite file).
+Point it at a scratch Postgres/MySQL database to measure real row contention;
+its tables are dropped and recreated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_DB = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'rwaride_booking_bench.db')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', DEFAULT_DB)
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-benchmark-secret-key')
+
+from config import Config  # noqa: E402
+
+if os.environ['DATABASE_URL'].startswith('sqlite'):
+    # Let concurrent SQLite writers wait for the lock instead of failing immediately
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Vehicle, Ride, PassengerRide  # noqa: E402
+
+
+def seed(app, passengers, seats):
+    """Creates one driver, one ride with `seats` seats and `passengers` passengers. Returns (ride_id, tokens)."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        driver = User(full_name='Bench Driver', email='driver@bench.rw', phone_number='0700000000', role='driver')
+        db.session.add(driver)
+        db.session.flush()
+        vehicle = Vehicle(owner_id=driver.id, license_plate='RAB000A', seat_capacity=seats)
+        db.session.add(vehicle)
+        db.session.flush()
+        ride = Ride(driver_id=driver.id, vehicle_id=vehicle.id, origin='Kimironko', destination='Nyabugogo',
+                    departure_time=datetime.utcnow() + timedelta(days=1),
+                    total_seats=seats, available_seats=seats, status='open')
+        db.session.add(ride)
+
+        users = [User(full_name=f'Passenger {i}', email=f'p{i}@bench.rw', phone_number=f'08{i:08d}', role='passenger')
+                 for i in range(passengers)]
+        db.session.add_all(users)
+        db.session.commit()
+
+        tokens = [create_access_token(identity=str(user.id)) for user in users]
+        return ride.id, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--passengers', type=int, default=300, help='simultaneous booking requests')
+    parser.add_argument('--seats', type=int, default=50, help='seats on the contested ride')
+    parser.add_argument('--workers', type=int, default=64, help='concurrent client threads')
+    args = parser.parse_args()
+
+    app = create_app()
+    ride_id, tokens = seed(app, args.passengers, args.seats)
+
+    start_gate = threading.Barrier(min(args.workers, len(tokens)))
+    local = threading.local()
+
+    def book(token):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            try:
+                start_gate.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                pass
+        started = time.perf_counter()
+        response = local.client.post(f'/api/rides/{ride_id}/book', json={'seats': 1},
+                                     headers={'Authorization': f'Bearer {token}'})
+        return response.status_code, time.perf_counter() - started
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(book, tokens))
+    wall = time.perf_counter() - wall_start
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+
+    with app.app_context():
+        ride = db.session.get(Ride, ride_id)
+        booked_seats = db.session.query(db.func.coalesce(db.func.sum(PassengerRide.seats_booked), 0)).filter(
+            PassengerRide.ride_id == ride_id, PassengerRide.status != 'canceled').scalar()
+        available, status = ride.available_seats, ride.status
+
+    expected_bookings = min(args.passengers, args.seats)
+    # Every request must either book (201) or be turned away cleanly (400/409); any 5xx is a failure
+    unexpected = {code: count for code, count in statuses.items() if code not in (201, 400, 409)}
+    correct = (
+        not unexpected
+        and booked_seats == args.seats - available
+        and available >= 0
+        and statuses.get(201, 0) == expected_bookings
+        and (status == 'full') == (available == 0)
+    )
+
+    print(f"database:         {os.environ['DATABASE_URL'].split('@')[-1]}")
+    print(f"requests:         {len(results)} with {args.workers} workers")
+    print(f"wall time:        {wall:.3f}s")
+    print(f"throughput:       {len(results) / wall:.1f} req/s")
+    print(f"latency p50/p99:  {latencies[len(latencies) // 2] * 1000:.1f}ms / "
+          f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f}ms")
+    print(f"responses:        {dict(sorted(statuses.items()))}")
+    print(f"seats:            {booked_seats} booked, {available} available of {args.seats} (ride status '{status}')")
+    if unexpected:
+        print(f"unexpected:       {dict(sorted(unexpected.items()))}")
+    print(f"correct:          {'yes' if correct else 'NO'}")
+    return 0 if correct else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
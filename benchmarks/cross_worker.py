@@ -0,0 +1,224 @@
+"""
+Cross-worker Socket.IO delivery check.
+
+Starts two workers (`python run.py` on separate ports, monkey-patched gevent)
+sharing a message queue, connects a passenger to one and the ride's driver to
+the other, and checks that events cross between them:
+
+  * the driver's update_location reaches the passenger's tracking_<ride> room
+  * the passenger's send_ride_message reaches the driver through ride_<ride>
+  * the driver's send_direct_message reaches the passenger's user_<id> room
+
+By default the workers are benchmarks/local_broker.py workers relaying through
+the stand-in broker, run inside this script; pass --queue redis://localhost:6379/0
+to test `python run.py` workers on a real Redis. --no-queue runs the workers unconnected, which must fail. Exits 1 if any
+event is not delivered.
+
+    python benchmarks/cross_worker.py
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+from socket_load import create_population  # noqa: E402
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from local_broker import Broker  # noqa: E402
+from app.tokens import access_claims  # noqa: E402
+
+DELIVERY_TIMEOUT = 5.0
+STARTUP_TIMEOUT = 30.0
+
+
+class PollingClient:
+    """
+    Bare Socket.IO client over Engine.IO v4 long-polling, using only the
+    standard library. Received events are put on `events` as (name, payload).
+    """
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/') + '/socket.io/?EIO=4&transport=polling'
+        self.events = queue.Queue()
+        handshake = self._get(self.base_url)
+        self.sid = json.loads(handshake[1:])['sid']
+        self.url = f'{self.base_url}&sid={self.sid}'
+        self._post('40' + json.dumps({'token': token}))
+        self.connected = threading.Event()
+        self.closed = False
+        threading.Thread(target=self._poll, daemon=True).start()
+        if not self.connected.wait(DELIVERY_TIMEOUT):
+            raise RuntimeError(f'Socket.IO connect to {base_url} was not acknowledged')
+
+    def _get(self, url):
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return response.read().decode()
+
+    def _post(self, body):
+        request = urllib.request.Request(self.url, data=body.encode(), method='POST')
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+    def _poll(self):
+        while not self.closed:
+            try:
+                payload = self._get(self.url)
+            except (urllib.error.URLError, OSError):
+                return
+            for packet in payload.split('\x1e'):
+                if packet == '2':
+                    self._post('3')  # pong
+                elif packet.startswith('40'):
+                    self.connected.set()
+                elif packet.startswith('42'):
+                    name, *args = json.loads(packet[2:])
+                    self.events.put((name, args[0] if args else None))
+                elif packet.startswith(('1', '41', '44')):
+                    return
+
+    def emit(self, event, data):
+        self._post('42' + json.dumps([event, data]))
+
+    def wait_for(self, event, predicate=lambda payload: True, timeout=DELIVERY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                name, payload = self.events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if name == event and predicate(payload):
+                return payload
+
+    def close(self):
+        self.closed = True
+        try:
+            self._post('41')
+        except (urllib.error.URLError, OSError):
+            pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(port, env, log, broker=None):
+    if broker:
+        command = [os.path.join(BENCH_DIR, 'local_broker.py'), 'worker', '--broker', broker, '--port', str(port)]
+    else:
+        command = [os.path.join(REPO_ROOT, 'run.py')]
+    process = subprocess.Popen([sys.executable, *command], cwd=REPO_ROOT,
+                               env={**env, 'PORT': str(port)}, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'worker on port {port} exited with {process.returncode}; see {log.name}')
+        try:
+            urllib.request.urlopen(url + '/api/rides/search', timeout=1).read()
+            return process, url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'worker on port {port} did not start; see {log.name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', help='message queue URL for the workers (default: a local stand-in broker)')
+    parser.add_argument('--no-queue', action='store_true', help='run the workers without a message queue')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        [(driver, [passenger], ride_id)] = create_population(1, 1)
+        tokens = {user.id: create_access_token(identity=str(user.id), additional_claims=access_claims(user))
+                  for user in (driver, passenger)}
+        database_url = db.engine.url.render_as_string(hide_password=False)
+
+    broker = broker_address = None
+    queue_url = args.queue
+    if not args.no_queue and not queue_url:
+        broker = Broker(('127.0.0.1', free_port()))
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+        broker_address = f'127.0.0.1:{broker.server_address[1]}'
+
+    env = {**os.environ, 'DATABASE_URL': database_url, 'GEVENT_MONKEY_PATCH': 'true',
+           'JWT_SECRET_KEY': app.config['JWT_SECRET_KEY']}
+    env.pop('SOCKETIO_MESSAGE_QUEUE', None)
+    if queue_url:
+        env['SOCKETIO_MESSAGE_QUEUE'] = queue_url
+    print(f"Message queue: {queue_url or (broker_address and f'stand-in broker at {broker_address}') or 'none'}")
+
+    log = tempfile.NamedTemporaryFile('w', prefix='cross_worker_', suffix='.log', delete=False)
+    workers, clients = [], []
+    failures = 0
+    try:
+        worker_a, url_a = start_worker(free_port(), env, log, broker_address)
+        workers.append(worker_a)
+        worker_b, url_b = start_worker(free_port(), env, log, broker_address)
+        workers.append(worker_b)
+        print(f"Workers: A {url_a}, B {url_b}")
+
+        rider = PollingClient(url_a, tokens[passenger.id])
+        clients.append(rider)
+        driver_client = PollingClient(url_b, tokens[driver.id])
+        clients.append(driver_client)
+        rider.emit('join_tracking', {'ride_id': ride_id})
+        rider.emit('join_ride_chat', {'ride_id': ride_id})
+        driver_client.emit('join_ride_chat', {'ride_id': ride_id})
+        time.sleep(0.5)  # joins are fire-and-forget
+
+        checks = [
+            ('location: driver on B -> tracking room on A', rider, 'location_received',
+             lambda: driver_client.emit('update_location', {'ride_id': ride_id, 'lat': -1.9501, 'lng': 30.0601}),
+             lambda p: p['lat'] == -1.9501),
+            ('ride chat: passenger on A -> driver on B', driver_client, 'new_ride_message',
+             lambda: rider.emit('send_ride_message', {'ride_id': ride_id, 'content': 'cross-worker hello'}),
+             lambda p: p['content'] == 'cross-worker hello'),
+            ('direct message: driver on B -> passenger on A', rider, 'new_private_message',
+             lambda: driver_client.emit('send_direct_message', {'ride_id': ride_id, 'receiver_id': passenger.id,
+                                                                'content': 'see you at 8'}),
+             lambda p: p['content'] == 'see you at 8'),
+        ]
+        for label, receiver, event, send, predicate in checks:
+            send()
+            delivered = receiver.wait_for(event, predicate)
+            print(f"  {'PASS' if delivered else 'FAIL'}  {label}")
+            failures += not delivered
+    finally:
+        for client in clients:
+            client.close()
+        for worker in workers:
+            worker.terminate()
+            worker.wait(timeout=10)
+        if broker:
+            broker.shutdown()
+        log.close()
+
+    if failures:
+        print(f"{failures} event(s) not delivered across workers; worker log: {log.name}")
+        return 1
+    os.unlink(log.name)
+    print("All events delivered across workers.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
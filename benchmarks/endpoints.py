@@ -0,0 +1,314 @@
+"""
+Endpoint benchmark suite.
+
+Seeds a database with benchmarks/seed.py, then drives every blueprint route
+through the Flask test client and reports p50/p95/p99 latency and the number
+of SQL statements per request for each endpoint.
+
+    python benchmarks/endpoints.py --users 2000 --rides 20000 --iterations 100
+    python benchmarks/endpoints.py --reuse --json after.json --baseline before.json
+
+--json saves the results and --baseline compares against a previous run.
+--reuse skips seeding and benchmarks whatever BENCH_DATABASE_URL already holds
+(from a previous run or benchmarks/seed.py). Mutating endpoints create their
+own targets before each timed request, so runs can be repeated on one database.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from seed import seed_database, finalize, PASSWORD  # noqa: E402
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Vehicle, Ride, PassengerRide, ChatMessage, DriverLocation  # noqa: E402
+from app.tokens import access_claims  # noqa: E402
+
+WARMUP = 3
+
+
+class SQLCounter:
+    """Counts statements issued by the benchmarking thread (background flushers are ignored)."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._thread = threading.get_ident()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        if threading.get_ident() == self._thread:
+            self.count += 1
+
+
+class Fixtures:
+    """Benchmark targets picked from whatever the database holds, plus helpers that create fresh ones."""
+
+    def __init__(self):
+        self.now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.admin = User.query.filter_by(role='admin').first()
+        # The busiest driver makes the dashboard and vehicle queries representative
+        busiest = db.session.query(Ride.driver_id, db.func.count(Ride.id)).group_by(
+            Ride.driver_id).order_by(db.func.count(Ride.id).desc()).first()
+        self.driver = db.session.get(User, busiest[0])
+        self.vehicle = Vehicle.query.filter_by(owner_id=self.driver.id).first()
+        self.passenger = db.session.query(User).join(
+            PassengerRide, PassengerRide.passenger_id == User.id
+        ).filter(User.role == 'passenger').first()
+        self.ride = Ride.query.filter(Ride.driver_id == self.driver.id, Ride.status == 'open',
+                                      Ride.departure_time > self.now).first() or self.new_ride()
+        self.chat_ride_id = db.session.query(ChatMessage.ride_id).order_by(ChatMessage.id.desc()).limit(1).scalar()
+        self.tracked_driver_id = DriverLocation.query.first().driver_id
+        self.tokens = {}
+        self.counter = 0
+
+    def token(self, user):
+        if user.id not in self.tokens:
+            self.tokens[user.id] = create_access_token(identity=str(user.id), additional_claims=access_claims(user))
+        return self.tokens[user.id]
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {self.token(user)}'}
+
+    def unique(self):
+        self.counter += 1
+        return f'{os.getpid()}x{int(time.time())}x{self.counter}'
+
+    def new_user(self, role='passenger'):
+        tag = self.unique()
+        user = User(full_name=f'Bench {tag}', email=f'{tag}@bench.rw', phone_number=tag[-15:], role=role)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def new_ride(self):
+        ride = Ride(driver_id=self.driver.id, vehicle_id=self.vehicle.id, origin='Kimironko', destination='Remera',
+                    departure_time=self.now + timedelta(days=3), total_seats=4, available_seats=4, status='open')
+        db.session.add(ride)
+        db.session.commit()
+        return ride
+
+    def new_booking(self):
+        booking = PassengerRide(passenger_id=self.new_user().id, ride_id=self.new_ride().id,
+                                seats_booked=1, status='pending')
+        db.session.add(booking)
+        db.session.commit()
+        return booking
+
+
+def build_cases(fx, client):
+    """
+    endpoint name -> list of (label, prepare). prepare(i) runs untimed and returns
+    (method, url, kwargs for the test client).
+    """
+    departure = (fx.now + timedelta(days=5)).isoformat()
+
+    def conditional_search(i):
+        url = '/api/rides/search?origin=kimi'
+        etag = client.get(url).headers.get('ETag')
+        return 'GET', url, {'headers': {'If-None-Match': etag}}
+
+    def booking_for(i):
+        booking = fx.new_booking()
+        return booking, db.session.get(User, booking.passenger_id)
+
+    def cancel(i):
+        booking, passenger = booking_for(i)
+        return 'PUT', f'/api/rides/booking/{booking.id}/cancel', {'headers': fx.auth(passenger)}
+
+    def delete_account(i):
+        user = fx.new_user()
+        return 'DELETE', '/api/auth/profile', {'headers': fx.auth(user)}
+
+    def delete_vehicle(i):
+        vehicle = Vehicle(owner_id=fx.driver.id, license_plate=fx.unique()[-10:], seat_capacity=4)
+        db.session.add(vehicle)
+        db.session.commit()
+        return 'DELETE', f'/api/vehicles/{vehicle.id}', {'headers': fx.auth(fx.driver)}
+
+    def book(i):
+        ride = fx.new_ride()
+        return 'POST', f'/api/rides/{ride.id}/book', {'headers': fx.auth(fx.new_user()), 'json': {'seats': 1}}
+
+    def change_role(i):
+        user = fx.new_user()
+        return 'PUT', f'/api/admin/users/{user.id}/role', {'headers': fx.auth(fx.admin), 'json': {'role': 'driver'}}
+
+    return {
+        'auth.register': [('register', lambda i: ('POST', '/api/auth/register', {'json': {
+            'full_name': 'Bench Register', 'email': f'{fx.unique()}@bench.rw', 'phone_number': fx.unique()[-15:],
+            'password': PASSWORD, 'role': 'passenger'}}))],
+        'auth.login': [('login', lambda i: ('POST', '/api/auth/login', {'json': {
+            'email': fx.passenger.email, 'password': PASSWORD}}))],
+        'auth.get_current_user': [('me', lambda i: ('GET', '/api/auth/me', {'headers': fx.auth(fx.passenger)}))],
+        'auth.update_user_profile': [('update profile', lambda i: ('PUT', '/api/auth/profile', {
+            'headers': fx.auth(fx.passenger), 'json': {'bio': f'Bio {i}'}}))],
+        'auth.delete_user_account': [('delete account', delete_account)],
+
+        'vehicle.register_vehicle': [('register vehicle', lambda i: ('POST', '/api/vehicles/', {
+            'headers': fx.auth(fx.driver), 'json': {'license_plate': fx.unique()[-10:], 'seat_capacity': 4}}))],
+        'vehicle.get_user_vehicles': [('list vehicles', lambda i: ('GET', '/api/vehicles/', {'headers': fx.auth(fx.driver)}))],
+        'vehicle.update_vehicle': [('update vehicle', lambda i: ('PUT', f'/api/vehicles/{fx.vehicle.id}', {
+            'headers': fx.auth(fx.driver), 'json': {'color': ['white', 'silver'][i % 2]}}))],
+        'vehicle.delete_vehicle': [('delete vehicle', delete_vehicle)],
+
+        'ride.create_ride': [('create ride', lambda i: ('POST', '/api/rides/', {'headers': fx.auth(fx.driver), 'json': {
+            'vehicle_id': fx.vehicle.id, 'origin': 'Kimironko', 'destination': 'Nyabugogo',
+            'origin_lat': -1.9355, 'origin_lng': 30.1034, 'destination_lat': -1.9394, 'destination_lng': 30.0445,
+            'waypoints': [[-1.9441, 30.0870]], 'departure_time': departure, 'total_seats': 4}}))],
+        'ride.update_ride': [('update ride', lambda i: ('PUT', f'/api/rides/{fx.ride.id}', {
+            'headers': fx.auth(fx.driver), 'json': {'departure_time': departure}}))],
+        'ride.delete_ride': [('delete ride', lambda i: ('DELETE', f'/api/rides/{fx.new_ride().id}', {
+            'headers': fx.auth(fx.driver)}))],
+        'ride.get_driver_rides': [
+            ('driver rides', lambda i: ('GET', '/api/rides/driver', {'headers': fx.auth(fx.driver)})),
+            ('driver rides (open)', lambda i: ('GET', '/api/rides/driver?status=open,full', {'headers': fx.auth(fx.driver)})),
+        ],
+        'ride.search_rides': [
+            ('search (all)', lambda i: ('GET', '/api/rides/search', {})),
+            ('search (origin+dest)', lambda i: ('GET', '/api/rides/search?origin=kimi&destination=remera', {})),
+            ('search (304)', conditional_search),
+        ],
+        'ride.nearby_rides': [('nearby', lambda i: ('GET', '/api/rides/nearby?origin_lat=-1.9355&origin_lng=30.1034'
+                                                           '&destination_lat=-1.9394&destination_lng=30.0445', {}))],
+        'ride.match_rides': [('match', lambda i: ('GET', '/api/rides/match?pickup_lat=-1.9441&pickup_lng=30.0870'
+                                                         '&dropoff_lat=-1.9394&dropoff_lng=30.0445', {}))],
+        'ride.create_booking': [('book', book)],
+        'ride.approve_booking': [('approve', lambda i: ('PUT', f'/api/rides/booking/{fx.new_booking().id}/approve', {
+            'headers': fx.auth(fx.driver)}))],
+        'ride.cancel_booking': [('cancel', cancel)],
+        'ride.get_user_bookings': [
+            ('bookings', lambda i: ('GET', '/api/rides/bookings', {'headers': fx.auth(fx.passenger)})),
+            ('bookings (upcoming)', lambda i: ('GET', '/api/rides/bookings?when=upcoming', {'headers': fx.auth(fx.passenger)})),
+        ],
+
+        'admin.get_stats': [('admin stats', lambda i: ('GET', '/api/admin/stats', {'headers': fx.auth(fx.admin)}))],
+        'admin.get_runtime_stats': [('admin runtime', lambda i: ('GET', '/api/admin/runtime', {'headers': fx.auth(fx.admin)}))],
+        'admin.get_perf_summary': [('admin perf', lambda i: ('GET', '/api/admin/perf', {'headers': fx.auth(fx.admin)}))],
+        'admin.verify_vehicle': [('verify vehicle', lambda i: ('POST', f'/api/admin/verify-vehicle/{fx.vehicle.id}', {
+            'headers': fx.auth(fx.admin)}))],
+        'admin.change_user_role': [('change role', change_role)],
+
+        'metrics.expose_metrics': [('metrics', lambda i: ('GET', '/metrics', {
+            'headers': {'Authorization': f"Bearer {client.application.config['METRICS_TOKEN']}"}}))],
+
+        'review.submit_review': [('submit review', lambda i: ('POST', '/api/reviews/submit', {
+            'headers': fx.auth(fx.passenger), 'json': {'ride_id': fx.ride.id, 'reviewee_id': fx.driver.id, 'rating': 4}}))],
+        'chat.get_chat_history': [('chat history', lambda i: ('GET', f'/api/chat/history/{fx.chat_ride_id}', {
+            'headers': fx.auth(fx.passenger)}))],
+        'tracking.get_driver_location': [('driver location', lambda i: ('GET', f'/api/tracking/location/{fx.tracked_driver_id}', {
+            'headers': fx.auth(fx.passenger)}))],
+    }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run(app, iterations, only=None):
+    client = app.test_client()
+    counter = SQLCounter(db.engine)
+    fx = Fixtures()
+    cases = build_cases(fx, client)
+
+    routes = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+    missing = sorted(routes - set(cases))
+    if missing:
+        print(f"WARNING: routes without a benchmark case: {', '.join(missing)}")
+
+    results = {}
+    for endpoint, variants in cases.items():
+        for label, prepare in variants:
+            if only and only not in label and only not in endpoint:
+                continue
+            latencies, statements, statuses = [], [], {}
+            for i in range(WARMUP + iterations):
+                method, url, kwargs = prepare(i)
+                db.session.remove()  # each request starts with a fresh session, as in production
+
+                before = counter.count
+                started = time.perf_counter()
+                response = client.open(url, method=method, **kwargs)
+                elapsed = time.perf_counter() - started
+                issued = counter.count - before
+                db.session.remove()
+
+                if i >= WARMUP:
+                    latencies.append(elapsed * 1000)
+                    statements.append(issued)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            latencies.sort()
+            results[label] = {
+                'endpoint': endpoint,
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'sql_per_request': round(sum(statements) / len(statements), 2),
+                'statuses': {str(code): count for code, count in sorted(statuses.items())},
+            }
+    return results
+
+
+def report(results, baseline=None):
+    header = f"{'endpoint':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL/req':>8}  statuses"
+    if baseline:
+        header += "   vs baseline (p50, SQL)"
+    print(header)
+    print('-' * len(header))
+    for label, r in results.items():
+        line = (f"{label:<24} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                f"{r['sql_per_request']:>8.1f}  {','.join(f'{c}x{n}' for c, n in r['statuses'].items()):<10}")
+        old = (baseline or {}).get(label)
+        if old:
+            change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+            line += f"   {change:+6.1f}%, {r['sql_per_request'] - old['sql_per_request']:+.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rides', type=int, default=20000)
+    parser.add_argument('--bookings-per-ride', type=int, default=3)
+    parser.add_argument('--messages-per-ride', type=int, default=3)
+    parser.add_argument('--reviews-per-ride', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=50, help='timed requests per endpoint')
+    parser.add_argument('--only', help='run only cases whose label or endpoint contains this text')
+    parser.add_argument('--reuse', action='store_true', help='benchmark the existing database without reseeding')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against results written by an earlier --json run')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"Database: {db.engine.url.render_as_string(hide_password=True)}")
+        if not args.reuse:
+            seed_database(args.users, args.rides, args.bookings_per_ride, args.messages_per_ride,
+                          args.reviews_per_ride)
+            finalize(app)
+        results = run(app, args.iterations, args.only)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print()
+    report(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
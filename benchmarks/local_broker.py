@@ -0,0 +1,195 @@
+"""
+Stand-in Socket.IO message broker for development and benchmarks.
+
+A minimal fan-out broker plus the client manager that talks to it, so
+multi-worker Socket.IO delivery can be exercised without Redis. It has no
+authentication, persistence or buffering and is not part of the app: workers
+only use it when started through this module. Production deployments set
+SOCKETIO_MESSAGE_QUEUE to a real queue (see app/socket_queue.py).
+
+    python benchmarks/local_broker.py broker --port 6390
+    python benchmarks/local_broker.py worker --broker 127.0.0.1:6390 --port 5001
+
+`worker` runs the app like `python run.py` (with monkey-patched gevent), but
+relays emits through the broker. benchmarks/cross_worker.py starts both.
+"""
+import sys
+
+# Patch before anything imports socket/threading, as run.py does
+if sys.argv[1:2] == ['worker']:
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import signal  # noqa: E402
+import socket  # noqa: E402
+import socketserver  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from urllib.parse import urlparse  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socketio import PubSubManager  # noqa: E402
+
+DEFAULT_BROKER_PORT = 6390
+# Seconds between attempts to reach a broker that is down
+RECONNECT_DELAY = 1.0
+
+
+class LocalBrokerManager(PubSubManager):
+    """
+    Client manager for the stand-in broker (URL local://host:port). Like the
+    Redis manager it needs monkey-patched sockets under gevent.
+    """
+    name = 'local'
+
+    def __init__(self, url=f'local://127.0.0.1:{DEFAULT_BROKER_PORT}', channel='socketio', write_only=False,
+                 logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or '127.0.0.1', parsed.port or DEFAULT_BROKER_PORT)
+        self._channel = self.channel.encode()
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+
+    def initialize(self):
+        super().initialize()
+        if 'gevent' in self.server.async_mode:
+            from gevent.monkey import is_module_patched
+            if not is_module_patched('socket'):
+                raise RuntimeError('The local broker requires a monkey patched socket library to work with '
+                                   + self.server.async_mode)
+
+    def _publish(self, data):
+        # JSON escapes newlines, so one message is always one line
+        line = b'PUB ' + self._channel + b' ' + self.json.dumps(data).encode() + b'\n'
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = socket.create_connection(self.address)
+                    self._publisher.sendall(line)
+                    return
+                except OSError:
+                    if self._publisher is not None:
+                        self._publisher.close()
+                        self._publisher = None
+            self._get_logger().error('Cannot publish to the Socket.IO broker at %s:%s', *self.address)
+
+    def _listen(self):
+        while True:
+            try:
+                with socket.create_connection(self.address) as connection:
+                    connection.sendall(b'SUB ' + self._channel + b'\n')
+                    for line in connection.makefile('rb'):
+                        yield line.rstrip(b'\n')
+                self._get_logger().error('Socket.IO broker closed the connection; reconnecting')
+            except OSError:
+                self._get_logger().error('Cannot reach the Socket.IO broker at %s:%s; retrying', *self.address)
+            time.sleep(RECONNECT_DELAY)
+
+
+class Broker(socketserver.ThreadingTCPServer):
+    """
+    Minimal fan-out message broker standing in for Redis in development and
+    tests. Clients send `SUB <channel>` to receive a channel's messages, or
+    `PUB <channel> <message>` lines, which are forwarded to every subscriber
+    of the channel. Nothing is persisted or buffered.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _BrokerConnection)
+        self._subscribers = {}  # channel -> set of sockets
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, connection):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(connection)
+
+    def unsubscribe(self, channel, connection):
+        with self._lock:
+            self._subscribers.get(channel, set()).discard(connection)
+
+    def publish(self, channel, message):
+        # Sending under the lock keeps concurrent publishes from interleaving on a subscriber
+        with self._lock:
+            for connection in list(self._subscribers.get(channel, ())):
+                try:
+                    connection.sendall(message)
+                except OSError:
+                    self._subscribers[channel].discard(connection)
+
+
+class _BrokerConnection(socketserver.StreamRequestHandler):
+    def handle(self):
+        channel = None
+        try:
+            for line in self.rfile:
+                command, _, rest = line.partition(b' ')
+                if command == b'PUB':
+                    target, _, message = rest.partition(b' ')
+                    self.server.publish(target, message)
+                elif command == b'SUB':
+                    channel = rest.strip()
+                    self.server.subscribe(channel, self.request)
+        except OSError:
+            pass
+        finally:
+            if channel is not None:
+                self.server.unsubscribe(channel, self.request)
+
+
+def run_broker(host, port):
+    broker = Broker((host, port))
+    print(f"Socket.IO broker listening on {host}:{port}")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
+
+
+def run_worker(broker, host, port):
+    from app import create_app, socketio
+    from app.metrics import MeteredManager
+
+    flask_app = create_app()
+    if flask_app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+        raise SystemExit("Unset SOCKETIO_MESSAGE_QUEUE; this worker relays through the stand-in broker")
+    # Installed before the first connection, which is when the manager starts listening
+    manager_class = type('MeteredLocalBrokerManager', (LocalBrokerManager, MeteredManager), {})
+    manager = manager_class(f'local://{broker}', channel=flask_app.config.get('SOCKETIO_CHANNEL', 'rwaride-socketio'))
+    manager.set_server(socketio.server)
+    socketio.server.manager = manager
+
+    # Exit normally on SIGTERM so atexit hooks flush buffered chat/location writes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    socketio.run(flask_app, host=host, port=port, debug=False, use_reloader=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    broker = commands.add_parser('broker', help='run the stand-in broker')
+    broker.add_argument('--host', default='127.0.0.1')
+    broker.add_argument('--port', type=int, default=DEFAULT_BROKER_PORT)
+    worker = commands.add_parser('worker', help='run an app worker that relays emits through the broker')
+    worker.add_argument('--broker', default=f'127.0.0.1:{DEFAULT_BROKER_PORT}', help='broker host:port')
+    worker.add_argument('--host', default='127.0.0.1')
+    worker.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == 'broker':
+        run_broker(args.host, args.port)
+    else:
+        run_worker(args.broker, args.host, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
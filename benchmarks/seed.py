@@ -0,0 +1,222 @@
+"""
+Synthetic data generator for benchmarks.
+
+Fills a database with users, vehicles, rides, bookings, chat messages,
+reviews and driver locations at configurable volumes, using chunked Core
+inserts so millions of rows load in minutes rather than hours.
+
+    python benchmarks/seed.py --users 100000 --rides 1000000 --bookings-per-ride 5
+
+The database comes from BENCH_DATABASE_URL (default: a SQLite file in the temp
+directory); its tables are dropped and recreated. Import seed_database() to
+reuse the generator from other benchmarks.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_DB = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'rwaride_bench.db')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', DEFAULT_DB)
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-benchmark-secret-key')
+os.environ.setdefault('METRICS_TOKEN', 'benchmark-metrics-token')
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import db  # noqa: E402
+from app.models import (User, Vehicle, Ride, PassengerRide, ChatMessage, Review,  # noqa: E402
+                        DriverLocation)
+from app.places import get_or_create_place  # noqa: E402
+from app.geo import encode_geohash, encode_polyline  # noqa: E402
+
+CHUNK_SIZE = 10000
+PASSWORD = 'benchmark'
+
+# Kigali neighbourhoods with rough coordinates
+PLACES = {
+    'Kimironko': (-1.9355, 30.1034), 'Nyabugogo': (-1.9394, 30.0445), 'Kacyiru': (-1.9441, 30.0870),
+    'Remera': (-1.9578, 30.1127), 'Kicukiro': (-1.9706, 30.1044), 'Nyamirambo': (-1.9789, 30.0450),
+    'Gisozi': (-1.9227, 30.0606), 'Kanombe': (-1.9686, 30.1394), 'Kibagabaga': (-1.9290, 30.1160),
+    'Gikondo': (-1.9760, 30.0760), 'Kiyovu': (-1.9530, 30.0620), 'Nyarutarama': (-1.9380, 30.1000),
+}
+RIDE_STATUSES = ['open'] * 6 + ['full', 'completed', 'completed', 'cancelled']
+BOOKING_STATUSES = ['pending', 'confirmed', 'confirmed', 'completed', 'canceled']
+
+
+def _insert(table, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[i:i + CHUNK_SIZE])
+    db.session.commit()
+
+
+def _stream(table, generator):
+    """Inserts rows from a generator in chunks without materializing them all."""
+    chunk, total = [], 0
+    for row in generator:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        total += len(chunk)
+    db.session.commit()
+    return total
+
+
+def seed_database(users=2000, rides=20000, bookings_per_ride=3, messages_per_ride=3,
+                  reviews_per_ride=1, driver_share=0.2, seed=1, echo=print):
+    """
+    Recreates all tables and fills them. Must run inside an app context.
+    Returns a dict describing the generated ids, for picking benchmark targets.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    db.drop_all()
+    db.create_all()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    password_hash = generate_password_hash(PASSWORD)
+
+    # Users: ids 1..users, every 1/driver_share-th one a driver, plus one admin at the end
+    driver_every = max(1, round(1 / driver_share))
+    _insert(User.__table__, [{
+        'full_name': f'Bench User {i}',
+        'email': f'user{i}@bench.rw',
+        'phone_number': f'07{i:08d}',
+        'password_hash': password_hash,
+        'created_at': now - timedelta(days=rng.randint(0, 700)),
+        'role': 'driver' if i % driver_every == 0 else 'passenger',
+        'driver_license_id': f'DL{i:08d}' if i % driver_every == 0 else None,
+        'is_identity_verified': rng.random() < 0.7,
+        'is_license_verified': i % driver_every == 0 and rng.random() < 0.8,
+    } for i in range(1, users + 1)])
+    db.session.add(User(full_name='Bench Admin', email='admin@bench.rw', phone_number='0799999999',
+                        password_hash=password_hash, role='admin'))
+    db.session.commit()
+    driver_ids = list(range(driver_every, users + 1, driver_every))
+    passenger_ids = [i for i in range(1, users + 1) if i % driver_every]
+    echo(f"  users:      {users + 1:>10,}  ({len(driver_ids):,} drivers)")
+
+    # One vehicle per driver; vehicle i belongs to driver_ids[i - 1]
+    _insert(Vehicle.__table__, [{
+        'owner_id': driver_id, 'license_plate': f'R{driver_id:08d}'[-10:],
+        'make': rng.choice(['Toyota', 'Suzuki', 'Hyundai', 'Nissan']), 'seat_capacity': 4,
+        'is_verified': rng.random() < 0.9,
+    } for driver_id in driver_ids])
+    vehicle_of = {driver_id: i for i, driver_id in enumerate(driver_ids, start=1)}
+
+    place_cache = {}
+    place_ids = {name: get_or_create_place(name, place_cache).id for name in PLACES}
+    db.session.commit()
+    names = list(PLACES)
+
+    # Index i holds ride id i's driver and departure (ids are assigned 1..rides in insert order)
+    ride_driver, ride_time = [None], [None]
+
+    def ride_rows():
+        for _ in range(rides):
+            driver_id = rng.choice(driver_ids)
+            origin, destination = rng.sample(names, 2)
+            (o_lat, o_lng), (d_lat, d_lng) = PLACES[origin], PLACES[destination]
+            o_lat, o_lng = o_lat + rng.uniform(-0.01, 0.01), o_lng + rng.uniform(-0.01, 0.01)
+            d_lat, d_lng = d_lat + rng.uniform(-0.01, 0.01), d_lng + rng.uniform(-0.01, 0.01)
+            # Half the rides stop at one or two other neighbourhoods on the way
+            stops = rng.sample([name for name in names if name not in (origin, destination)], rng.choice([0, 0, 1, 2]))
+            waypoints = [(PLACES[name][0] + rng.uniform(-0.005, 0.005), PLACES[name][1] + rng.uniform(-0.005, 0.005))
+                         for name in stops]
+            departure = now + timedelta(minutes=rng.randint(-60 * 24 * 365, 60 * 24 * 30))
+            status = rng.choice(RIDE_STATUSES) if departure > now else rng.choice(['completed', 'cancelled'])
+            ride_driver.append(driver_id)
+            ride_time.append(departure)
+            yield {
+                'driver_id': driver_id, 'vehicle_id': vehicle_of[driver_id],
+                'origin': origin, 'destination': destination,
+                'origin_place_id': place_ids[origin], 'destination_place_id': place_ids[destination],
+                'origin_lat': o_lat, 'origin_lng': o_lng, 'origin_geohash': encode_geohash(o_lat, o_lng),
+                'destination_lat': d_lat, 'destination_lng': d_lng,
+                'destination_geohash': encode_geohash(d_lat, d_lng),
+                'waypoints_polyline': encode_polyline(waypoints) if waypoints else None,
+                'departure_time': departure, 'total_seats': 4,
+                'available_seats': 0 if status == 'full' else 4,
+                'status': status, 'created_at': departure - timedelta(days=2), 'updated_at': departure - timedelta(days=1),
+            }
+    _stream(Ride.__table__, ride_rows())
+    echo(f"  rides:      {rides:>10,}")
+
+    def booking_rows():
+        for ride_id in range(1, rides + 1):
+            for passenger_id in rng.sample(passenger_ids, min(bookings_per_ride, len(passenger_ids))):
+                yield {'passenger_id': passenger_id, 'ride_id': ride_id, 'seats_booked': 1,
+                       'status': rng.choice(BOOKING_STATUSES),
+                       'booked_at': ride_time[ride_id] - timedelta(hours=rng.randint(1, 72))}
+    echo(f"  bookings:   {_stream(PassengerRide.__table__, booking_rows()):>10,}")
+
+    def message_rows():
+        for ride_id in range(1, rides + 1):
+            for m in range(messages_per_ride):
+                yield {'ride_id': ride_id,
+                       'sender_id': ride_driver[ride_id] if m % 2 else rng.choice(passenger_ids),
+                       'content': rng.choice(['On my way', 'I am at the pickup point', 'Running 5 min late', 'Thanks!']),
+                       'uid': f'{ride_id:016x}{m:016x}',
+                       'timestamp': ride_time[ride_id] - timedelta(minutes=messages_per_ride - m)}
+    echo(f"  messages:   {_stream(ChatMessage.__table__, message_rows()):>10,}")
+
+    def review_rows():
+        for ride_id in range(1, rides + 1):
+            for _ in range(reviews_per_ride):
+                yield {'ride_id': ride_id, 'reviewer_id': rng.choice(passenger_ids),
+                       'reviewee_id': ride_driver[ride_id], 'rating': rng.choice([3, 4, 4, 5, 5, 5]),
+                       'comment': None, 'created_at': ride_time[ride_id] + timedelta(hours=2)}
+    echo(f"  reviews:    {_stream(Review.__table__, review_rows()):>10,}")
+
+    _insert(DriverLocation.__table__, [{
+        'driver_id': driver_id, 'latitude': -1.95 + rng.uniform(-0.03, 0.03),
+        'longitude': 30.08 + rng.uniform(-0.03, 0.03), 'updated_at': now,
+    } for driver_id in driver_ids])
+
+    echo(f"  seeded in {time.perf_counter() - started:.1f}s")
+    return {
+        'users': users, 'rides': rides, 'admin_id': users + 1,
+        'driver_ids': driver_ids, 'passenger_ids': passenger_ids, 'vehicle_of': vehicle_of,
+        'ride_driver': ride_driver, 'ride_time': ride_time, 'now': now,
+    }
+
+
+def finalize(app):
+    """Rebuilds the derived data the bulk inserts skipped: route cells, rating aggregates and admin counters."""
+    runner = app.test_cli_runner()
+    for command in (['routes', 'reindex'], ['ratings', 'backfill'], ['stats', 'reconcile']):
+        result = runner.invoke(args=command)
+        if result.exit_code != 0:
+            raise RuntimeError(f"flask {' '.join(command)} failed: {result.output}")
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rides', type=int, default=20000)
+    parser.add_argument('--bookings-per-ride', type=int, default=3)
+    parser.add_argument('--messages-per-ride', type=int, default=3)
+    parser.add_argument('--reviews-per-ride', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        print(f"Seeding {db.engine.url.render_as_string(hide_password=True)}")
+        seed_database(args.users, args.rides, args.bookings_per_ride, args.messages_per_ride,
+                      args.reviews_per_ride, seed=args.seed)
+        finalize(app)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Serialization microbenchmark.
+
+Compares building a 10k-row ride list the old way (ORM objects -> to_dict()
+-> stdlib jsonify) with the new path (column rows -> RowSerializer ->
+FastJSONProvider, orjson-backed when installed).
+
+    python benchmarks/serialization.py --rows 10000 --repeat 5
+
+Runs against an in-memory SQLite database.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-benchmark-secret-key')
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Vehicle, Ride  # noqa: E402
+from app.serialization import FastJSONProvider, ride_row, orjson  # noqa: E402
+
+
+def seed(rows):
+    driver = User(full_name='Bench Driver', email='driver@bench.rw', phone_number='0700000000', role='driver')
+    db.session.add(driver)
+    db.session.flush()
+    vehicle = Vehicle(owner_id=driver.id, license_plate='RAB000A', seat_capacity=4)
+    db.session.add(vehicle)
+    db.session.flush()
+    start = datetime.utcnow()
+    db.session.execute(Ride.__table__.insert(), [{
+        'driver_id': driver.id, 'vehicle_id': vehicle.id,
+        'origin': f'Origin {i % 50}', 'destination': f'Destination {i % 70}',
+        'origin_lat': -1.95 + i * 1e-5, 'origin_lng': 30.06 + i * 1e-5,
+        'departure_time': start + timedelta(minutes=i),
+        'total_seats': 4, 'available_seats': 4, 'status': 'open'
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def orm_path(app, provider):
+    db.session.expunge_all()
+    rides = Ride.query.order_by(Ride.id).all()
+    with app.test_request_context():
+        return provider.response([ride.to_dict() for ride in rides]).get_data()
+
+
+def row_path(app, provider):
+    rows = ride_row.query().order_by(Ride.id).all()
+    with app.test_request_context():
+        return provider.response(ride_row.dump_all(rows)).get_data()
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+
+        cases = [
+            ('ORM + to_dict + stdlib json', lambda: orm_path(app, stdlib)),
+            ('ORM + to_dict + FastJSONProvider', lambda: orm_path(app, fast)),
+            ('rows + RowSerializer + stdlib json', lambda: row_path(app, stdlib)),
+            ('rows + RowSerializer + FastJSONProvider', lambda: row_path(app, fast)),
+        ]
+
+        print(f"{args.rows} rides, best of {args.repeat}; orjson {'installed' if orjson else 'NOT installed (stdlib fallback)'}")
+        baseline = None
+        bodies = []
+        for name, fn in cases:
+            seconds, body = timed(fn, args.repeat)
+            bodies.append(body)
+            baseline = baseline or seconds
+            print(f"  {name:<42} {seconds * 1000:8.1f} ms  {baseline / seconds:5.2f}x  {len(body) / 1024:7.0f} KiB")
+
+    decoded = [stdlib.loads(body) for body in bodies]
+    if any(payload != decoded[0] for payload in decoded[1:]):
+        print("Serialized payloads differ between paths")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
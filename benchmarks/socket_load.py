@@ -0,0 +1,262 @@
+"""
+Socket.IO load generator for live tracking and ride chat.
+
+Simulates N drivers sending 'update_location' pings into their ride's
+tracking_<ride_id> room, with M passengers listening in each room and in
+the ride's chat room, plus 'send_ride_message' traffic from those passengers.
+Connections go through the Flask-SocketIO test client, so every event runs
+the real connect/auth, handler, coalescer and room fan-out code in this
+process without network I/O.
+
+    python benchmarks/socket_load.py --drivers 200 --passengers-per-ride 10 --duration 20
+    LOCATION_DELTA_ENCODING=true python benchmarks/socket_load.py --ping-rate 2
+
+Reports inbound event throughput, deliveries per second, end-to-end
+broadcast latency (emit by the sender to arrival in a listener's queue,
+including time a ping is held by the coalescer) and process CPU per inbound
+event. CPU includes the test client's per-recipient packet encode/decode,
+so it is an upper bound on the server's own cost. The coalescer reads its
+settings from the usual LOCATION_* environment variables.
+
+WARNING: every run drops and recreates all tables of the benchmark database.
+That is a throwaway SQLite file unless BENCH_DATABASE_URL is set; any other
+database is refused unless --yes is given, so never point it at data you
+want to keep.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from seed import DEFAULT_DB, PASSWORD  # noqa: E402
+from endpoints import percentile  # noqa: E402
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from flask_socketio.test_client import SocketIOTestClient  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import create_app, db, socketio  # noqa: E402
+from app.models import User, Vehicle, Ride  # noqa: E402
+from app.socket_tracking import coalescer, DELTA_SCALE  # noqa: E402
+from app.chat_pipeline import chat_pipeline  # noqa: E402
+from app.metrics import MeteredManager  # noqa: E402
+from app.tokens import access_claims  # noqa: E402
+
+# Degrees a driver moves per ping (~11 m, above the default 5 m coalescing threshold)
+STEP = 0.0001
+TICKS_PER_SECOND = 20
+
+
+def create_population(drivers, passengers_per_ride):
+    """Recreates the tables with one open ride per driver and its passengers. Returns [(driver, [passengers], ride_id)]."""
+    db.drop_all()
+    db.create_all()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    password_hash = generate_password_hash(PASSWORD)
+    total = drivers * (1 + passengers_per_ride)
+
+    db.session.execute(User.__table__.insert(), [{
+        'full_name': f'Load User {i}', 'email': f'load{i}@bench.rw', 'phone_number': f'07{i:08d}',
+        'password_hash': password_hash, 'created_at': now,
+        'role': 'driver' if i <= drivers else 'passenger',
+    } for i in range(1, total + 1)])
+    db.session.execute(Vehicle.__table__.insert(), [{
+        'owner_id': i, 'license_plate': f'L{i:08d}', 'seat_capacity': passengers_per_ride + 1,
+    } for i in range(1, drivers + 1)])
+    db.session.execute(Ride.__table__.insert(), [{
+        'driver_id': i, 'vehicle_id': i, 'origin': 'Kimironko', 'destination': 'Nyabugogo',
+        'departure_time': now + timedelta(hours=1), 'total_seats': passengers_per_ride + 1,
+        'available_seats': 0, 'status': 'full', 'created_at': now, 'updated_at': now,
+    } for i in range(1, drivers + 1)])
+    db.session.commit()
+
+    users = {user.id: user for user in User.query}
+    return [(users[i], [users[drivers + (i - 1) * passengers_per_ride + p]
+                        for p in range(1, passengers_per_ride + 1)], i)
+            for i in range(1, drivers + 1)]
+
+
+def connect(app, user):
+    token = create_access_token(identity=str(user.id), additional_claims=access_claims(user))
+    client = socketio.test_client(app, auth={'token': token})
+    if not client.is_connected():
+        raise RuntimeError(f"user {user.id} was refused by the connect handler")
+    return client
+
+
+class StampingManager(MeteredManager):
+    """Client manager that records when each emit lands in a test client's queue."""
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        result = super().emit(event, data, namespace, room=room, skip_sid=skip_sid, callback=callback,
+                              to=to, **kwargs)
+        received_at = time.perf_counter()
+        target = to or room
+        rooms = self.rooms.get(namespace, {})
+        for name in target if isinstance(target, (list, tuple)) else [target]:
+            # Direct emits target the recipient's own sid room
+            for eio_sid in rooms.get(name, {}).values():
+                client = SocketIOTestClient.clients.get(eio_sid)
+                if client and client.queue:
+                    client.queue[-1].setdefault('received_at', received_at)
+        return result
+
+
+def install_stamping_manager():
+    """Replaces the client manager; call before the first client connects."""
+    manager = StampingManager()
+    manager.set_server(socketio.server)
+    socketio.server.manager = manager
+
+
+def run(app, drivers, passengers_per_ride, duration, ping_rate, chat_rate, seed=1):
+    rng = random.Random(seed)
+    population = create_population(drivers, passengers_per_ride)
+    install_stamping_manager()
+
+    print(f"Connecting {drivers * (1 + passengers_per_ride):,} clients...")
+    streams = []
+    for driver, passengers, ride_id in population:
+        driver_client = connect(app, driver)
+        listeners = [connect(app, passenger) for passenger in passengers]
+        for client in listeners:
+            client.emit('join_tracking', {'ride_id': ride_id})
+            client.emit('join_ride_chat', {'ride_id': ride_id})
+        driver_client.emit('join_ride_chat', {'ride_id': ride_id})
+        for client in listeners + [driver_client]:
+            client.get_received()
+        streams.append({
+            'driver': driver_client, 'driver_id': str(driver.id), 'ride_id': ride_id, 'listeners': listeners,
+            'lat': -1.95 + rng.uniform(-0.05, 0.05), 'lng': 30.08 + rng.uniform(-0.05, 0.05),
+        })
+
+    ping_sent = {}  # (driver_id, quantized lat) -> perf_counter at emit
+    chat_sent = {}  # content -> perf_counter at emit
+    pings = messages = 0
+    pings_per_tick = drivers * ping_rate / TICKS_PER_SECOND
+    messages_per_tick = drivers * chat_rate / TICKS_PER_SECOND
+    ping_budget = message_budget = 0.0
+    next_stream = 0
+
+    print(f"Running for {duration}s: {drivers * ping_rate:,.0f} pings/s, {drivers * chat_rate:,.1f} chat messages/s")
+    cpu_started, started = time.process_time(), time.perf_counter()
+    tick = 0
+    while time.perf_counter() - started < duration:
+        ping_budget += pings_per_tick
+        while ping_budget >= 1:
+            ping_budget -= 1
+            stream = streams[next_stream]
+            next_stream = (next_stream + 1) % len(streams)
+            stream['lat'] += STEP
+            stream['lng'] += STEP * rng.uniform(-1, 1)
+            ping_sent[(stream['driver_id'], round(stream['lat'] * DELTA_SCALE))] = time.perf_counter()
+            stream['driver'].emit('update_location', {'ride_id': stream['ride_id'],
+                                                      'lat': stream['lat'], 'lng': stream['lng']})
+            pings += 1
+
+        message_budget += messages_per_tick
+        while message_budget >= 1:
+            message_budget -= 1
+            stream = rng.choice(streams)
+            content = f"load message {messages}"
+            chat_sent[content] = time.perf_counter()
+            rng.choice(stream['listeners']).emit('send_ride_message', {'ride_id': stream['ride_id'], 'content': content})
+            messages += 1
+
+        tick += 1
+        # Yield to the coalescer and chat flushers until the next tick is due
+        socketio.sleep(max(0.0, started + tick / TICKS_PER_SECOND - time.perf_counter()))
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    # Let held pings go out before collecting (they count towards latency, not throughput)
+    socketio.sleep(coalescer.config['min_interval'] + 0.5)
+    chat_pipeline.flush()
+
+    location_latencies, chat_latencies = [], []
+    deliveries = 0
+    for stream in streams:
+        for client in stream['listeners'] + [stream['driver']]:
+            last_q = {}
+            for event in client.queue:
+                deliveries += 1
+                payload = event['args'][0] if event['args'] else {}
+                if event['name'] == 'location_received':
+                    q = round(payload['lat'] * DELTA_SCALE)
+                elif event['name'] == 'location_delta':
+                    q = last_q.get(payload['driver_id'])
+                    if q is None:
+                        continue
+                    q += payload['dlat']
+                elif event['name'] == 'new_ride_message':
+                    sent_at = chat_sent.get(payload['content'])
+                    if sent_at is not None:
+                        chat_latencies.append((event['received_at'] - sent_at) * 1000)
+                    continue
+                else:
+                    continue
+                last_q[payload['driver_id']] = q
+                sent_at = ping_sent.get((payload['driver_id'], q))
+                if sent_at is not None:
+                    location_latencies.append((event['received_at'] - sent_at) * 1000)
+            client.queue.clear()
+
+    for stream in streams:
+        for client in stream['listeners'] + [stream['driver']]:
+            client.disconnect()
+
+    return {
+        'elapsed': elapsed, 'cpu': cpu, 'pings': pings, 'messages': messages, 'deliveries': deliveries,
+        'location_latencies': sorted(location_latencies), 'chat_latencies': sorted(chat_latencies),
+        'coalescer': coalescer.stats(), 'chat_pipeline': chat_pipeline.stats(),
+    }
+
+
+def report(result):
+    inbound = result['pings'] + result['messages']
+    print()
+    print(f"Inbound events:     {inbound:>10,}  ({inbound / result['elapsed']:,.0f}/s; "
+          f"{result['pings']:,} pings, {result['messages']:,} chat)")
+    print(f"Deliveries:         {result['deliveries']:>10,}  ({result['deliveries'] / result['elapsed']:,.0f}/s)")
+    print(f"CPU per event:      {result['cpu'] / max(inbound, 1) * 1e6:>10,.1f} us  "
+          f"({result['cpu'] / result['elapsed'] * 100:.0f}% of one core)")
+    for name, latencies in (('Location broadcast', result['location_latencies']),
+                            ('Chat broadcast', result['chat_latencies'])):
+        if latencies:
+            print(f"{name + ' latency:':<30}p50 {percentile(latencies, 50):8.2f} ms   "
+                  f"p95 {percentile(latencies, 95):8.2f} ms   p99 {percentile(latencies, 99):8.2f} ms   "
+                  f"max {latencies[-1]:8.2f} ms   (n={len(latencies):,})")
+    c = result['coalescer']
+    print(f"Coalescer:          {c['pings_received']:,} received, {c['broadcasts']:,} broadcast "
+          f"({c['delta_broadcasts']:,} delta), {c['pings_dropped']:,} dropped, {c['pings_deferred']:,} deferred")
+    p = result['chat_pipeline']
+    print(f"Chat pipeline:      {p['messages_persisted']:,} persisted in {p['batches_written']:,} batches, "
+          f"{p['backpressure_flushes']:,} backpressure flushes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drivers', type=int, default=100, help='drivers, each with one ride and tracking room')
+    parser.add_argument('--passengers-per-ride', type=int, default=4, help='listeners in each tracking and chat room')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load')
+    parser.add_argument('--ping-rate', type=float, default=1, help='location pings per driver per second')
+    parser.add_argument('--chat-rate', type=float, default=0.1, help='chat messages per ride per second')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--yes', action='store_true', help='allow dropping the tables of a BENCH_DATABASE_URL database')
+    args = parser.parse_args()
+    if os.environ['DATABASE_URL'] != DEFAULT_DB and not args.yes:
+        parser.error("refusing to drop and recreate the tables of BENCH_DATABASE_URL; pass --yes if it is disposable")
+
+    app = create_app()
+    with app.app_context():
+        print(f"Database: {db.engine.url.render_as_string(hide_password=True)} (async mode: {socketio.async_mode})")
+        result = run(app, args.drivers, args.passengers_per_ride, args.duration, args.ping_rate,
+                     args.chat_rate, seed=args.seed)
+    report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
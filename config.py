@@ -22,6 +22,67 @@ class Config:
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    SQLALCHEMY_POOL_RECYCLE = 300
-    SQLALCHEMY_POOL_SIZE = 5
-    SQLALCHEMY_POOL_TIMEOUT = 10
\ No newline at end of file
+    # Connections per worker process: an equal share of DB_MAX_CONNECTIONS across
+    # WEB_CONCURRENCY workers (the variable gunicorn reads), but never more than the
+    # greenlets/threads one worker runs (WORKER_CONNECTIONS). DB_CONCURRENCY, when set,
+    # bounds concurrent checkouts and queues the rest (app/db_concurrency.py); off (0)
+    # by default, enable it once verified under the deployed worker class.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    WORKER_CONNECTIONS = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 20))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or
+                       max(1, min(WORKER_CONNECTIONS, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)))
+    DB_CONCURRENCY = int(os.environ.get('DB_CONCURRENCY') or 0)
+    DB_QUEUE_TIMEOUT = float(os.environ.get('DB_QUEUE_TIMEOUT', 10))
+    # 'auto' makes psycopg2 yield to gevent when Socket.IO runs on gevent; 'true' / 'false' force it
+    DB_GREEN = os.environ.get('DB_GREEN', 'auto').lower()
+
+    # SQLite picks its own pool class, which takes no sizing arguments
+    SQLALCHEMY_ENGINE_OPTIONS = {} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': 0,
+        'pool_timeout': DB_QUEUE_TIMEOUT,
+        'pool_recycle': 300
+    }
+
+    # Seconds between write-behind flushes of live driver locations
+    LOCATION_FLUSH_INTERVAL = float(os.environ.get('LOCATION_FLUSH_INTERVAL', 5))
+
+    # Tracking broadcast coalescing (see app/socket_tracking.py)
+    LOCATION_MIN_MOVE_METERS = float(os.environ.get('LOCATION_MIN_MOVE_METERS', 5))
+    LOCATION_MIN_BROADCAST_INTERVAL = float(os.environ.get('LOCATION_MIN_BROADCAST_INTERVAL', 1))
+    LOCATION_MAX_SILENCE = float(os.environ.get('LOCATION_MAX_SILENCE', 15))
+    LOCATION_DELTA_ENCODING = os.environ.get('LOCATION_DELTA_ENCODING', 'false').lower() == 'true'
+    LOCATION_KEYFRAME_EVERY = int(os.environ.get('LOCATION_KEYFRAME_EVERY', 10))
+
+    # Write-behind persistence of Socket.IO chat messages (see app/chat_pipeline.py)
+    CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', 0.25))
+    CHAT_BATCH_SIZE = int(os.environ.get('CHAT_BATCH_SIZE', 500))
+    CHAT_QUEUE_MAX = int(os.environ.get('CHAT_QUEUE_MAX', 10000))
+
+    # Admin dashboard counters (see app/stats.py)
+    STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 10))
+    STATS_FLUSH_INTERVAL = float(os.environ.get('STATS_FLUSH_INTERVAL', 5))
+    STATS_RECONCILE_INTERVAL = float(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))
+
+    # Read-through cache of caller profiles (see app/user_cache.py); backend is 'memory' or 'redis'.
+    # With 'memory' and WEB_CONCURRENCY > 1, token revocation checks read the database instead
+    USER_CACHE_BACKEND = os.environ.get('USER_CACHE_BACKEND', 'memory')
+    USER_CACHE_URL = os.environ.get('USER_CACHE_URL', 'redis://localhost:6379/0')
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+    # Per-request SQL and latency instrumentation (see app/perf.py); summary at /api/admin/perf
+    PERF_ENABLED = os.environ.get('PERF_ENABLED', 'true').lower() == 'true'
+    PERF_SLOW_REQUEST_MS = float(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+    PERF_WINDOW = int(os.environ.get('PERF_WINDOW', 1000))
+    PERF_SLOW_STATEMENTS = int(os.environ.get('PERF_SLOW_STATEMENTS', 5))
+
+    # Prometheus metrics at /metrics (see app/metrics.py), served only when METRICS_TOKEN is set;
+    # scrapers send it as a bearer token
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Relay Socket.IO emits between workers (see app/socket_queue.py), e.g. redis://host:6379/0
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'rwaride-socketio')
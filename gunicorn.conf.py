@@ -0,0 +1,7 @@
+# Read by gunicorn from the working directory (see Procfile)
+
+
+def worker_exit(server, worker):
+    """Writes out buffered chat messages, driver locations and counters before the worker exits."""
+    from app.background import flush_all
+    flush_all()
@@ -1,6 +1,18 @@
+import os
+
+# Patch before anything imports socket/threading so PyMySQL and the stdlib cooperate with gevent
+if os.environ.get('GEVENT_MONKEY_PATCH', 'false').lower() == 'true':
+    from gevent import monkey
+    monkey.patch_all()
+
+import signal
+import sys
 from app import create_app, socketio
 
 flask_app = create_app()
 
 if __name__ == '__main__':
-    socketio.run(flask_app, debug=False, use_reloader=False)
\ No newline at end of file
+    # Exit normally on SIGTERM so atexit hooks flush buffered chat/location writes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    socketio.run(flask_app, host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)),
+                 debug=False, use_reloader=False)
@@ -0,0 +1,95 @@
+"""
+Shared fixtures for the test suite.
+
+Tests run against TEST_DATABASE_URL, or a throwaway SQLite file when it is
+unset; never against DATABASE_URL. Every test starts from freshly created
+tables. Requests go through Flask's test client; setup and checks open their
+own app context, so the test never shares a session with the handlers.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///' + os.path.join(
+    tempfile.mkdtemp(prefix='rwaride-tests-'), 'test.db')
+os.environ['JWT_SECRET_KEY'] = 'test-secret-key-long-enough-for-hs256'
+# Single-worker defaults; tests that need more set it on the app themselves
+os.environ['WEB_CONCURRENCY'] = '1'
+
+from config import Config  # noqa: E402
+
+if Config.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    # Concurrent writers wait for SQLite's lock instead of failing straight away
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Ride  # noqa: E402
+from app.tokens import access_claims  # noqa: E402
+from app.user_cache import user_cache  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture(autouse=True)
+def tables(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    user_cache.clear()
+    yield
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class Factory:
+    """Creates rows and tokens for a test. Rows are returned by id, not as ORM objects."""
+
+    def __init__(self, app):
+        self.app = app
+        self.count = 0
+
+    def user(self, role='passenger', **fields):
+        self.count += 1
+        with self.app.app_context():
+            user = User(full_name=fields.pop('full_name', f'User {self.count}'),
+                        email=f'user{self.count}@example.com',
+                        phone_number=f'+25078{self.count:07d}',
+                        role=role, **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    def ride(self, driver_id, seats=3, departs_in=timedelta(days=1), **fields):
+        with self.app.app_context():
+            ride = Ride(driver_id=driver_id,
+                        origin=fields.pop('origin', 'Kimironko'),
+                        destination=fields.pop('destination', 'Kacyiru'),
+                        departure_time=datetime.now(timezone.utc).replace(tzinfo=None) + departs_in,
+                        total_seats=seats, available_seats=fields.pop('available_seats', seats),
+                        status=fields.pop('status', 'open'), **fields)
+            db.session.add(ride)
+            db.session.commit()
+            return ride.id
+
+    def headers(self, user_id):
+        """Authorization headers with a fresh access token for the user."""
+        with self.app.app_context():
+            user = db.session.get(User, user_id)
+            token = create_access_token(identity=str(user.id), additional_claims=access_claims(user))
+        return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def factory(app):
+    return Factory(app)
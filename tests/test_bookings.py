@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.models import Ride, PassengerRide
+
+# Every outcome a booking may have under contention; anything else (a 5xx) is a bug
+BOOKING_STATUSES = {201, 400, 409}
+
+
+def send_concurrently(app, requests):
+    """Sends (method, url, headers, json) requests, one thread each, all released at once."""
+    start = threading.Barrier(len(requests))
+
+    def send(request):
+        method, url, headers, json = request
+        client = app.test_client()
+        try:
+            start.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        return client.open(url, method=method, headers=headers, json=json).status_code
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(send, requests))
+
+
+def seat_accounting(app, ride_id):
+    with app.app_context():
+        ride = db.session.get(Ride, ride_id)
+        booked = db.session.query(db.func.coalesce(db.func.sum(PassengerRide.seats_booked), 0)).filter(
+            PassengerRide.ride_id == ride_id, PassengerRide.status != 'canceled'
+        ).scalar()
+        return ride.total_seats, ride.available_seats, ride.status, booked
+
+
+def test_concurrent_bookings_fill_ride_exactly(app, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver, seats=10)
+    passengers = [factory.user() for _ in range(40)]
+
+    statuses = Counter(send_concurrently(app, [
+        ('POST', f'/api/rides/{ride}/book', factory.headers(p), {'seats': 1}) for p in passengers
+    ]))
+
+    assert set(statuses) <= BOOKING_STATUSES, statuses
+    assert statuses[201] == 10
+    assert seat_accounting(app, ride) == (10, 0, 'full', 10)
+
+
+def test_concurrent_multi_seat_bookings_never_oversell(app, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver, seats=7)
+    passengers = [factory.user() for _ in range(30)]
+
+    requests = [('POST', f'/api/rides/{ride}/book', factory.headers(p), {'seats': 1 + i % 3})
+                for i, p in enumerate(passengers)]
+    statuses = send_concurrently(app, requests)
+
+    assert set(statuses) <= BOOKING_STATUSES, Counter(statuses)
+    total, available, status, booked = seat_accounting(app, ride)
+    assert booked == sum(request[3]['seats'] for request, code in zip(requests, statuses) if code == 201)
+    assert total - available == booked
+    assert available >= 0
+    assert status == ('full' if available == 0 else 'open')
+
+
+def test_resize_during_bookings_keeps_seat_accounting(app, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver, seats=5)
+    passengers = [factory.user() for _ in range(30)]
+
+    requests = [('POST', f'/api/rides/{ride}/book', factory.headers(p), {'seats': 1}) for p in passengers]
+    requests.insert(len(requests) // 2, ('PUT', f'/api/rides/{ride}', factory.headers(driver), {'total_seats': 15}))
+    statuses = send_concurrently(app, requests)
+    resize = statuses.pop(len(requests) // 2)
+
+    # The resize either applied or lost a race with a booking that changed the ride's status
+    assert resize in (200, 409)
+    assert set(statuses) <= BOOKING_STATUSES, Counter(statuses)
+    total, available, status, booked = seat_accounting(app, ride)
+    assert total == (15 if resize == 200 else 5)
+    assert booked == statuses.count(201)
+    assert total - available == booked
+    assert status == ('full' if available == 0 else 'open')
+
+
+def test_resize_below_booked_seats_is_rejected(client, app, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver, seats=4)
+    for passenger in (factory.user(), factory.user()):
+        response = client.post(f'/api/rides/{ride}/book', headers=factory.headers(passenger), json={'seats': 1})
+        assert response.status_code == 201
+
+    response = client.put(f'/api/rides/{ride}', headers=factory.headers(driver), json={'total_seats': 1})
+    assert response.status_code == 400
+    assert seat_accounting(app, ride) == (4, 2, 'open', 2)
+
+    response = client.put(f'/api/rides/{ride}', headers=factory.headers(driver), json={'total_seats': 2})
+    assert response.status_code == 200
+    assert seat_accounting(app, ride) == (2, 0, 'full', 2)
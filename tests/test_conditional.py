@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.chat_pipeline import chat_pipeline
+from app.models import ChatMessage
+
+
+def get(client, url, headers=None, etag=None):
+    """GETs url, revalidating against etag when given."""
+    headers = dict(headers or {})
+    if etag:
+        headers['If-None-Match'] = etag
+    return client.get(url, headers=headers)
+
+
+def assert_unchanged(client, url, headers=None):
+    """The page comes back with an ETag that revalidates to a 304. Returns the 200 response."""
+    response = get(client, url, headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    revalidated = get(client, url, headers, etag)
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    return response
+
+
+def assert_changed(client, url, previous, headers=None):
+    """Revalidating the previous response's ETag now returns the new page. Returns it."""
+    response = get(client, url, headers, previous.headers['ETag'])
+    assert response.status_code == 200
+    assert response.headers['ETag'] != previous.headers['ETag']
+    return response
+
+
+def test_search_etag_follows_driver_rating(client, factory):
+    driver = factory.user('driver')
+    passenger = factory.user()
+    ride = factory.ride(driver)
+    url = '/api/rides/search'
+
+    before = assert_unchanged(client, url)
+    response = client.post('/api/reviews/submit', headers=factory.headers(passenger),
+                           json={'ride_id': ride, 'reviewee_id': driver, 'rating': 2})
+    assert response.status_code == 201
+
+    after = assert_changed(client, url, before)
+    assert after.get_json()['rides'][0]['driver_rating'] != before.get_json()['rides'][0]['driver_rating']
+    assert_unchanged(client, url)
+
+
+def test_search_etag_follows_rides_on_the_page(client, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver, seats=3)
+    url = '/api/rides/search'
+
+    before = assert_unchanged(client, url)
+    response = client.put(f'/api/rides/{ride}', headers=factory.headers(driver), json={'total_seats': 4})
+    assert response.status_code == 200
+    after = assert_changed(client, url, before)
+    assert after.get_json()['rides'][0]['available_seats'] == 4
+
+    factory.ride(driver, departs_in=timedelta(hours=2))
+    after_new_ride = assert_changed(client, url, after)
+    assert len(after_new_ride.get_json()['rides']) == 2
+
+
+def test_chat_etag_follows_late_inserts(client, app, factory):
+    driver = factory.user('driver')
+    ride = factory.ride(driver)
+    headers = factory.headers(driver)
+    url = f'/api/chat/history/{ride}'
+    with app.app_context():
+        chat_pipeline.submit(ride, driver, 'Leaving at eight')
+        chat_pipeline.flush()
+
+    before = assert_unchanged(client, url, headers)
+
+    # Another worker's pipeline writes a message stamped before the newest one already stored
+    with app.app_context():
+        db.session.add(ChatMessage(ride_id=ride, sender_id=driver, content='Running late',
+                                   timestamp=datetime.now(timezone.utc) - timedelta(minutes=5)))
+        db.session.commit()
+
+    after = assert_changed(client, url, before, headers)
+    assert [m['content'] for m in after.get_json()['messages']] == ['Running late', 'Leaving at eight']
+    assert_unchanged(client, url, headers)
+
+
+def test_driver_rides_etag_follows_bookings(client, factory):
+    driver = factory.user('driver')
+    passenger = factory.user()
+    ride = factory.ride(driver, seats=2)
+    headers = factory.headers(driver)
+    url = '/api/rides/driver'
+
+    before = assert_unchanged(client, url, headers)
+    response = client.post(f'/api/rides/{ride}/book', headers=factory.headers(passenger), json={'seats': 2})
+    assert response.status_code == 201
+
+    after = assert_changed(client, url, before, headers)
+    assert after.get_json()['rides'][0]['available_seats'] == 0
+    assert after.get_json()['rides'][0]['status'] == 'full'
+    assert_unchanged(client, url, headers)
@@ -0,0 +1,129 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.geo import route_points, best_route_insertion
+from app.models import Ride
+
+# Central Kigali; rides and passengers are spread over a few km around it
+CENTER = (-1.9441, 30.0619)
+SPREAD_DEG = 0.04
+
+
+def random_point(rng, near=None, spread=SPREAD_DEG):
+    lat, lng = near or CENTER
+    return lat + rng.uniform(-spread, spread), lng + rng.uniform(-spread, spread)
+
+
+def seed_rides(app, rng, driver_id, count):
+    now = datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    with app.app_context():
+        for i in range(count):
+            total = rng.randint(1, 4)
+            available = rng.randint(0, total)
+            status = rng.choice(['open', 'open', 'open', 'full', 'canceled', 'completed'])
+            # Whole minutes, at least ten away from now, so "departs after now" can't flip mid-test
+            departure = now + timedelta(minutes=rng.choice([-1, 1]) * rng.randint(10, 48 * 60))
+            ride = Ride(driver_id=driver_id, origin=f'Origin {i}', destination=f'Destination {i}',
+                        departure_time=departure, total_seats=total, available_seats=available, status=status)
+            ride.set_origin_point(random_point(rng))
+            ride.set_destination_point(random_point(rng))
+            ride.set_waypoints([random_point(rng) for _ in range(rng.randint(0, 3))])
+            ride.index_route()
+            db.session.add(ride)
+        db.session.commit()
+        return db.session.query(Ride).all()
+
+
+def brute_force_matches(rides, pickup, dropoff, radius, seats, departs_from, departs_to):
+    """Every ride the passenger could take, checked one by one without the route index."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    departs_after = max(now, departs_from) if departs_from else now
+    matches = set()
+    for ride in rides:
+        if ride.status != 'open' or ride.available_seats < seats:
+            continue
+        if not ride.departure_time > departs_after:
+            continue
+        if departs_to and not ride.departure_time < departs_to:
+            continue
+        points = route_points(ride.origin_lat, ride.origin_lng, ride.waypoints_polyline,
+                              ride.destination_lat, ride.destination_lng)
+        if best_route_insertion(points, pickup, dropoff, radius):
+            matches.add(ride.id)
+    return matches
+
+
+def match(client, pickup, dropoff, radius, seats, departs_from=None, departs_to=None):
+    params = {'pickup_lat': pickup[0], 'pickup_lng': pickup[1], 'dropoff_lat': dropoff[0],
+              'dropoff_lng': dropoff[1], 'radius_km': radius, 'seats': seats, 'limit': 100}
+    if departs_from:
+        params['from'] = departs_from.isoformat()
+    if departs_to:
+        params['to'] = departs_to.isoformat()
+    response = client.get('/api/rides/match', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_match_agrees_with_brute_force(client, app, factory):
+    rng = random.Random(25)
+    rides = seed_rides(app, rng, factory.user('driver'), 120)
+    routes = [route_points(r.origin_lat, r.origin_lng, r.waypoints_polyline, r.destination_lat, r.destination_lng)
+              for r in rides]
+
+    matched_queries = 0
+    for _ in range(60):
+        # Mostly trips along some ride's route, so that most queries have matches
+        route = rng.choice(routes)
+        first = rng.randrange(len(route) - 1)
+        last = rng.randrange(first + 1, len(route))
+        pickup = random_point(rng, route[first], 0.004)
+        dropoff = random_point(rng, route[last], 0.004)
+        if rng.random() < 0.2:
+            pickup, dropoff = dropoff, pickup
+        radius = rng.choice([0.2, 0.5, 1.0, 2.0])
+        seats = rng.choice([1, 1, 2])
+
+        departs_from = departs_to = None
+        if rng.random() < 0.5:
+            # Bounds on some ride's exact departure time: `from` may lie in the past, `to` is exclusive
+            departs_from = rng.choice(rides).departure_time
+            departs_to = rng.choice(rides).departure_time
+            if departs_to < departs_from:
+                departs_from, departs_to = departs_to, departs_from
+
+        expected = brute_force_matches(rides, pickup, dropoff, radius, seats, departs_from, departs_to)
+        assert len(expected) < 100
+        found = match(client, pickup, dropoff, radius, seats, departs_from, departs_to)
+
+        assert {ride['id'] for ride in found} == expected
+        detours = [ride['detour_km'] for ride in found]
+        assert detours == sorted(detours)
+        matched_queries += bool(expected)
+
+    # The comparison means little if almost every query came back empty
+    assert matched_queries >= 20
+
+
+def test_match_window_excludes_its_end(client, app, factory):
+    driver = factory.user('driver')
+    pickup, dropoff = (-1.9500, 30.0600), (-1.9300, 30.0900)
+    departure = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) + timedelta(hours=3)
+    with app.app_context():
+        ride = Ride(driver_id=driver, origin='Nyamirambo', destination='Kimironko',
+                    departure_time=departure, total_seats=3, available_seats=3, status='open')
+        ride.set_origin_point(pickup)
+        ride.set_destination_point(dropoff)
+        ride.index_route()
+        db.session.add(ride)
+        db.session.commit()
+        ride_id = ride.id
+
+    def found(departs_from, departs_to):
+        return [r['id'] for r in match(client, pickup, dropoff, 0.5, 1, departs_from, departs_to)]
+
+    assert found(departure - timedelta(hours=1), departure) == []
+    assert found(departure - timedelta(hours=1), departure + timedelta(seconds=1)) == [ride_id]
+    assert found(departure, departure + timedelta(hours=1)) == []
+    assert found(departure - timedelta(seconds=1), departure + timedelta(hours=1)) == [ride_id]
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import User
+from app.user_cache import user_cache
+
+
+def serve_with_workers(app, count):
+    """Configures the app as if `count` workers (WEB_CONCURRENCY) served it."""
+    app.config['WEB_CONCURRENCY'] = count
+    user_cache.init_app(app)
+    yield count
+    app.config['WEB_CONCURRENCY'] = 1
+    user_cache.init_app(app)
+
+
+@pytest.fixture(params=[1, 3], ids=['one-worker', 'three-workers'])
+def workers(request, app):
+    yield from serve_with_workers(app, request.param)
+
+
+@pytest.fixture
+def several_workers(app):
+    yield from serve_with_workers(app, 3)
+
+
+def test_token_revoked_by_another_worker_is_rejected(client, app, factory, several_workers):
+    user = factory.user()
+    headers = factory.headers(user)
+    # Caches the user in this worker
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    # Another worker revokes: the row changes, but this worker's cache is never told
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == user).values(token_version=User.token_version + 1))
+        db.session.commit()
+
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.get('/api/auth/me', headers=factory.headers(user)).status_code == 200
+
+
+def test_role_change_revokes_existing_tokens(client, factory, workers):
+    admin = factory.user('admin')
+    user = factory.user()
+    headers = factory.headers(user)
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    response = client.put(f'/api/admin/users/{user}/role', headers=factory.headers(admin), json={'role': 'driver'})
+    assert response.status_code == 200
+
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    response = client.get('/api/auth/me', headers=factory.headers(user))
+    assert response.status_code == 200
+    assert response.get_json()['role'] == 'driver'
+
+
+def test_token_of_deleted_user_is_rejected(client, app, factory, workers):
+    user = factory.user()
+    headers = factory.headers(user)
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, user))
+        db.session.commit()
+
+    assert client.get('/api/auth/me', headers=headers).status_code == 401